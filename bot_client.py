@@ -0,0 +1,203 @@
+"""Headless load generator: scripted bots against local River Raid servers.
+
+Bots speak the same file protocol as the pygame clients (net_protocol's
+GameConnection). A server hosts one player per world, so every bot gets its
+own server process with its own state, input and metrics files. Load ramps up
+in stages, and after each stage we print:
+
+- input-to-snapshot latency: from writing an input until a snapshot echoing
+  its seq is read back
+- dropped inputs: inputs a newer one replaced in the input file before any
+  tick applied them (the servers' inputs_skipped metric)
+- tick overruns: ticks that started over 1.5 tick intervals after the
+  previous one, summed over all servers
+
+Usage:
+    python bot_client.py [--step 20] [--stages 5] [--stage-seconds 10] [--rate 60]
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import queue
+import random
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from net_protocol import GameConnection
+
+
+def session_paths(root, n):
+    base = os.path.join(root, f'session{n}')
+    return base + '_input.json', base + '_state.json', base + '_metrics.json'
+
+
+def start_session(root, n, extra_args):
+    input_path, state_path, metrics_path = session_paths(root, n)
+    cmd = [sys.executable, 'game_server.py', '--input-path', input_path, '--state-path', state_path,
+           '--metrics-path', metrics_path, '--spectator-port', '0', '--checkpoint', '', '--event-log', '', *extra_args]
+    return subprocess.Popen(cmd, cwd=os.path.dirname(os.path.abspath(__file__)),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def read_tick_metrics(root, n):
+    """(overruns, inputs_skipped) from a session's last metrics write."""
+    try:
+        with open(session_paths(root, n)[2]) as f:
+            ticks = json.load(f)['ticks']
+        return ticks['overruns'], ticks['inputs_skipped']
+    except (FileNotFoundError, ValueError, KeyError):
+        return 0, 0
+
+
+class Bot:
+    """Weaves with a sine wave, shoots every few frames and restarts on game over."""
+
+    def __init__(self, connection: GameConnection, rate):
+        self.connection = connection
+        self.interval = 1 / rate
+        self.phase = random.random() * math.tau
+        self.lock = threading.Lock()
+        self.sent = {}            # seq -> perf_counter() when written, until echoed or superseded
+        self.latencies = []
+        self.inputs = 0
+        self.errors = 0
+
+    def run(self):
+        frame = 0
+        next_frame = time.perf_counter()
+        while True:
+            frame += 1
+            state = self.connection.fetch_game_state()
+            if state:
+                self.observe(state.get('input_seq'))
+
+            game_over = bool(state and state.get('game_over'))
+            dx = round(5 * math.sin(self.phase + frame / 30))
+            try:
+                seq = self.connection.send_input(0 if game_over else dx, 0, frame % 8 == 0 and not game_over,
+                                                 restart=game_over)
+                with self.lock:
+                    self.sent[seq] = time.perf_counter()
+                    self.inputs += 1
+            except OSError:
+                with self.lock:
+                    self.errors += 1
+
+            next_frame += self.interval
+            time.sleep(max(0, next_frame - time.perf_counter()))
+
+    def observe(self, seq):
+        if seq is None or seq not in self.sent:
+            return
+        now = time.perf_counter()
+        with self.lock:
+            self.latencies.append((now - self.sent.pop(seq)) * 1000)
+            # Older seqs were skipped or applied between two snapshots - never echoed
+            for s in [s for s in self.sent if s < seq]:
+                del self.sent[s]
+
+    def take_stats(self):
+        with self.lock:
+            stats = (self.latencies, self.inputs, self.errors)
+            self.latencies = []
+            self.inputs = self.errors = 0
+        return stats
+
+
+def worker_main(root, sessions, rate, results):
+    """One process driving a group of bots, reporting to the parent once a second."""
+    bots = []
+    for n in sessions:
+        input_path, state_path, _ = session_paths(root, n)
+        bot = Bot(GameConnection(input_path, state_path), rate)
+        threading.Thread(target=bot.run, daemon=True, name=f"Bot{n}").start()
+        bots.append(bot)
+
+    while True:
+        time.sleep(1)
+        latencies, inputs, errors = [], 0, 0
+        for bot in bots:
+            l, i, e = bot.take_stats()
+            latencies += l
+            inputs += i
+            errors += e
+        results.put((latencies, inputs, errors))
+
+
+def run(args):
+    from game_server import percentile  # Only the parent reports; keeps spawned workers light
+
+    root = tempfile.mkdtemp(prefix='riverraid_bots_')
+    extra_args = ['--split-process'] if args.split_process else []
+    results = multiprocessing.Queue()
+    servers, workers = [], []
+
+    print(f"Ramping {args.stages} stages of +{args.step} sessions, {args.stage_seconds:.0f}s each, "
+          f"bots at {args.rate:.0f} Hz (files in {root})\n")
+    print(f"{'sessions':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'inputs/s':>9} "
+          f"{'dropped':>8} {'errors':>7} {'overruns/s':>11}")
+    try:
+        for stage in range(args.stages):
+            first = len(servers)
+            for n in range(first, first + args.step):
+                servers.append(start_session(root, n, extra_args))
+            time.sleep(args.warmup)  # Let the new servers write their first snapshot
+
+            worker = multiprocessing.Process(target=worker_main, daemon=True,
+                                             args=(root, range(first, len(servers)), args.rate, results))
+            worker.start()
+            workers.append(worker)
+            time.sleep(args.warmup)
+            while not results.empty():
+                results.get()  # Discard the ramp-up
+
+            latencies, inputs, errors = [], 0, 0
+            before = [read_tick_metrics(root, n) for n in range(len(servers))]
+            end = time.time() + args.stage_seconds
+            while time.time() < end:
+                try:
+                    l, i, e = results.get(timeout=max(0.01, end - time.time()))
+                except queue.Empty:
+                    continue
+                latencies += l
+                inputs += i
+                errors += e
+            after = [read_tick_metrics(root, n) for n in range(len(servers))]
+            stage_overruns = sum(a[0] - b[0] for a, b in zip(after, before))
+            dropped = sum(a[1] - b[1] for a, b in zip(after, before))
+
+            dropped_pct = dropped / inputs * 100 if inputs else 0
+            print(f"{len(servers):>8} {percentile(latencies, 50):>8.1f} {percentile(latencies, 95):>8.1f} "
+                  f"{percentile(latencies, 99):>8.1f} {inputs / args.stage_seconds:>9.0f} "
+                  f"{dropped_pct:>7.1f}% {errors:>7} {stage_overruns / args.stage_seconds:>11.1f}")
+    except KeyboardInterrupt:
+        print("\nStopping...")
+    finally:
+        for worker in workers:
+            worker.terminate()
+        for server in servers:
+            server.send_signal(signal.SIGINT)  # Like Ctrl+C, so split-process servers free their shared memory
+        for server in servers:
+            try:
+                server.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                server.kill()
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--step', type=int, default=20, help="Sessions (server + bot) added per stage")
+    parser.add_argument('--stages', type=int, default=5)
+    parser.add_argument('--stage-seconds', type=float, default=10)
+    parser.add_argument('--warmup', type=float, default=2, help="Seconds before measuring a new stage")
+    parser.add_argument('--rate', type=float, default=60, help="Bot input/poll rate in Hz, like the pygame client")
+    parser.add_argument('--split-process', action='store_true', help="Run each server with --split-process")
+    run(parser.parse_args())
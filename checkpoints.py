@@ -0,0 +1,194 @@
+"""Crash-safe on-disk checkpoints of a running game.
+
+A checkpoint is a base file holding every section of the world, plus a
+journal of JSON lines that each hold only what changed since the previous
+write. Sections that are lists of entities (dicts with an `entity_id`) are
+journaled per entity: the current id order, plus the changed fields of each
+entity that moved or changed and the whole of each new one. Other sections
+are journaled whole when they change. Every `compact_every` writes the base
+is rewritten (temp file + rename) and the journal truncated, so a restart
+replays at most that many small lines.
+
+The server only provides capture (a cheap copy taken under state_lock) and
+restore; serialization, diffing and disk I/O happen on the writer thread.
+"""
+import json
+import os
+import threading
+import time
+
+
+def _dump(obj) -> bytes:
+    return json.dumps(obj, separators=(',', ':')).encode()
+
+
+def _is_entity_list(value) -> bool:
+    return isinstance(value, list) and all(isinstance(e, dict) and 'entity_id' in e for e in value)
+
+
+def entity_diff(previous: dict, current: dict) -> dict | None:
+    """Journal form of an entity section, both given as {entity_id: fields}.
+    None if nothing changed"""
+    changed = []
+    for entity_id, entity in current.items():
+        old = previous.get(entity_id)
+        if old is None:
+            changed.append(entity)
+        else:
+            fields = {k: v for k, v in entity.items() if old.get(k) != v}
+            if fields:
+                changed.append({'entity_id': entity_id, **fields})
+    ids = list(current)
+    if not changed and ids == list(previous):
+        return None
+    return {'ids': ids, 'changed': changed}
+
+
+def apply_entity_diff(entities: list, diff: dict) -> list:
+    by_id = {e['entity_id']: e for e in entities}
+    for fields in diff['changed']:
+        by_id[fields['entity_id']] = {**by_id.get(fields['entity_id'], {}), **fields}
+    return [by_id[entity_id] for entity_id in diff['ids']]
+
+
+def load_checkpoint(path: str) -> dict | None:
+    """Base file plus every complete journal line written after it."""
+    try:
+        with open(path, 'rb') as f:
+            checkpoint = json.loads(f.read())
+    except (FileNotFoundError, ValueError):
+        return None
+
+    try:
+        with open(path + '.journal', 'rb') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break  # Torn write from a crash - everything after it is lost
+                if entry['seq'] <= checkpoint['seq']:
+                    continue  # Crashed between compaction and journal truncate
+                sections = checkpoint['sections']
+                sections.update(entry['sections'])
+                for name, diff in entry.get('entities', {}).items():
+                    sections[name] = apply_entity_diff(sections[name], diff)
+                checkpoint['seq'] = entry['seq']
+                checkpoint['time'] = entry['time']
+    except FileNotFoundError:
+        pass
+    return checkpoint
+
+
+class CheckpointWriter:
+    def __init__(self, server, path: str, interval=1.0, compact_every=30, fsync=True):
+        self.server = server
+        self.path = path
+        self.interval = interval
+        self.compact_every = compact_every
+        self.fsync = fsync
+
+        self.seq = 0
+        self.written: dict[str, bytes] = {}  # Section name -> last serialized form
+        self.entities: dict[str, dict] = {}  # Entity section name -> {entity_id: last fields}
+        self.since_compact = 0
+        self.journal = None
+        self.write_lock = threading.Lock()  # Writer thread vs final write on shutdown
+
+        # Stats for metrics / benchmarks
+        self.wait_ms = 0.0   # Waiting for state_lock
+        self.lock_ms = 0.0   # Holding state_lock
+        self.write_ms = 0.0
+        self.last_bytes = 0
+        self.last_full = False
+
+    def start(self):
+        thread = threading.Thread(target=self.run, daemon=True, name="Checkpoint")
+        thread.start()
+        return thread
+
+    def run(self):
+        print(f"[Checkpoint] Writing to {self.path} every {self.interval}s")
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.write()
+            except OSError as e:
+                print(f"[Checkpoint] Write failed: {e}")
+
+    def write(self):
+        with self.write_lock:
+            self._write()
+
+    def _write(self):
+        t0 = time.perf_counter()
+        with self.server.state_lock:
+            t1 = time.perf_counter()
+            sections = self.server.capture_checkpoint()
+        t2 = time.perf_counter()
+
+        entities = {name: {e['entity_id']: e for e in value}
+                    for name, value in sections.items() if _is_entity_list(value)}
+        encoded = {name: _dump(value) for name, value in sections.items() if name not in entities}
+
+        self.seq += 1
+        if self.journal is None or self.since_compact >= self.compact_every:
+            self._write_base({name: encoded.get(name) or _dump(value) for name, value in sections.items()})
+        else:
+            changed = {name: data for name, data in encoded.items() if self.written.get(name) != data}
+            diffs = {}
+            for name, current in entities.items():
+                if name not in self.entities:
+                    changed[name] = _dump(sections[name])
+                else:
+                    diff = entity_diff(self.entities[name], current)
+                    if diff:
+                        diffs[name] = diff
+            if changed or diffs:
+                self._append(changed, diffs)
+        self.written = encoded
+        self.entities = entities
+
+        self.wait_ms = (t1 - t0) * 1000
+        self.lock_ms = (t2 - t1) * 1000
+        self.write_ms = (time.perf_counter() - t2) * 1000
+
+    def _write_base(self, encoded):
+        body = b','.join(b'"%s":%s' % (name.encode(), data) for name, data in encoded.items())
+        data = b'{"seq":%d,"time":%r,"sections":{%s}}' % (self.seq, time.time(), body)
+
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            self._sync(f)
+        os.replace(tmp_path, self.path)
+
+        if self.journal:
+            self.journal.close()
+        self.journal = open(self.path + '.journal', 'wb')
+        self.since_compact = 0
+        self.last_bytes = len(data)
+        self.last_full = True
+
+    def _append(self, changed, diffs):
+        body = b','.join(b'"%s":%s' % (name.encode(), data) for name, data in changed.items())
+        line = b'{"seq":%d,"time":%r,"sections":{%s},"entities":%s}\n' % (self.seq, time.time(), body, _dump(diffs))
+        self.journal.write(line)
+        self._sync(self.journal)
+        self.since_compact += 1
+        self.last_bytes = len(line)
+        self.last_full = False
+
+    def _sync(self, f):
+        f.flush()
+        if self.fsync:
+            os.fsync(f.fileno())
+
+    def stats(self) -> dict:
+        return {
+            'seq': self.seq,
+            'wait_ms': round(self.wait_ms, 3),
+            'lock_ms': round(self.lock_ms, 3),
+            'write_ms': round(self.write_ms, 3),
+            'last_bytes': self.last_bytes,
+            'last_full': self.last_full,
+        }
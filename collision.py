@@ -0,0 +1,58 @@
+"""Batched collision tests for many ships and bullets against the world.
+
+Testing every ship and every bullet against every world entity costs
+players x entities per tick. Here each tick does one pass per batch:
+
+- Ships: all ships fly on (nearly) the same row, so the world entities are
+  first filtered once against the band of rows the ships cover. Only the
+  few that overlap it are matched, by bisecting the ships sorted by x.
+- Bullets: sorted by y once, and each entity bisects for the bullets within
+  reach of its own y before the exact test.
+
+Both return candidate pairs in a deterministic order; the exact overlap
+test is still Entity.collides_at, so results match the pairwise loops.
+"""
+from bisect import bisect_left, bisect_right
+
+
+def ships_vs_world(ships, targets):
+    """(ship, target) pairs that overlap, grouped by target in target order."""
+    if not ships or not targets:
+        return []
+    top = min(s.y - s.height / 2 for s in ships)
+    bottom = max(s.y + s.height / 2 for s in ships)
+    widest = max(s.width for s in ships)
+
+    by_x = sorted(ships, key=lambda s: s.x)
+    xs = [s.x for s in by_x]
+    pairs = []
+    for target in targets:
+        if target.y + target.height / 2 <= top or target.y - target.height / 2 >= bottom:
+            continue  # Nowhere near the ships' row
+        reach = (target.width + widest) / 2
+        for ship in by_x[bisect_left(xs, target.x - reach):bisect_right(xs, target.x + reach)]:
+            if ship.collides_with(target):
+                pairs.append((ship, target))
+    return pairs
+
+
+def bullets_vs_targets(bullets, targets, positions=None):
+    """(bullet, target) pairs that overlap, grouped by target in target order.
+
+    positions maps entity_id -> (x, y) to test against where targets were
+    (lag compensation); targets missing from it are tested where they are.
+    """
+    if not bullets or not targets:
+        return []
+    by_y = sorted(bullets, key=lambda b: b.y)
+    ys = [b.y for b in by_y]
+    tallest = max(b.height for b in bullets)
+
+    pairs = []
+    for target in targets:
+        x, y = positions.get(target.entity_id, (target.x, target.y)) if positions else (target.x, target.y)
+        reach = (target.height + tallest) / 2
+        for bullet in by_y[bisect_left(ys, y - reach):bisect_right(ys, y + reach)]:
+            if bullet.collides_at(target, x, y):
+                pairs.append((bullet, target))
+    return pairs
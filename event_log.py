@@ -0,0 +1,192 @@
+"""Structured game events, logged without blocking the simulation.
+
+emit() is called on hot paths, usually with state_lock held, so it only
+appends the record to a bounded ring (a deque, whose append/popleft are
+atomic). A background writer drains the ring to a JSON-lines file and echoes
+the records worth seeing to the console; stop() has it write whatever is
+still queued before the file is closed. If the writer falls behind, the
+oldest records are overwritten; per-kind rate limits keep one noisy kind
+(say, spawns) from pushing everything else out. Both losses are counted.
+
+Each line is {"kind": ..., "time": ..., <record fields>}, e.g.
+    {"kind":"death","time":1700000000.1,"tick":812,"reason":"Out of fuel","lives":2,"player":0}
+"""
+import json
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import ClassVar
+
+
+@dataclass
+class Event:
+    kind: ClassVar[str] = 'event'
+    echo: ClassVar[bool] = True  # Also print to the console
+
+    def message(self) -> str:
+        return f"[{self.kind}] {asdict(self)}"
+
+
+@dataclass
+class Death(Event):
+    kind: ClassVar[str] = 'death'
+    tick: int
+    reason: str
+    lives: int
+    player: int = 0
+
+    def message(self):
+        who = f"Player {self.player} " if self.player else ""
+        return f"{who}Death: {self.reason}. Lives remaining: {self.lives}"
+
+
+@dataclass
+class Respawn(Event):
+    kind: ClassVar[str] = 'respawn'
+    tick: int
+    player: int = 0
+
+    def message(self):
+        return f"Player {self.player} respawned" if self.player else "Respawn Complete"
+
+
+@dataclass
+class Checkpoint(Event):
+    """A destroyed bridge - the player's new restart point."""
+    kind: ClassVar[str] = 'checkpoint'
+    tick: int
+    bridge_id: int
+    score: int
+
+    def message(self):
+        return f"Bridge {self.bridge_id} destroyed. Checkpoint saved."
+
+
+@dataclass
+class Spawn(Event):
+    kind: ClassVar[str] = 'spawn'
+    echo: ClassVar[bool] = False
+    tick: int
+    entity: str
+    entity_id: int
+    x: float
+    y: float
+
+
+@dataclass
+class GameOver(Event):
+    kind: ClassVar[str] = 'game_over'
+    tick: int
+    score: int
+
+    def message(self):
+        return f"=== GAME OVER === Score: {self.score}. Waiting for restart input (press R)..."
+
+
+@dataclass
+class Reset(Event):
+    kind: ClassVar[str] = 'reset'
+    tick: int
+
+    def message(self):
+        return "[Game] Game restarted."
+
+
+@dataclass
+class Status(Event):
+    kind: ClassVar[str] = 'status'
+    tick: int
+    lives: int
+    score: int
+    fuel: float
+    bridge: int
+
+    def message(self):
+        return f"Lives: {self.lives} | Score: {self.score} | Fuel: {self.fuel:.1f} | Bridge: {self.bridge}"
+
+
+class EventLog:
+    def __init__(self, path: str | None, capacity=4096, rate_limits=None, default_rate=100,
+                 flush_interval=0.1, echo=True):
+        self.path = path
+        self.ring = deque(maxlen=capacity)
+        self.rate_limits = {'spawn': 20, **(rate_limits or {})}  # Kind -> records per second
+        self.default_rate = default_rate
+        self.flush_interval = flush_interval
+        self.echo = echo
+
+        # Per-kind [window start, count]. Updated without a lock, so limits are approximate
+        self.windows: dict[str, list] = {}
+
+        self.emitted = 0
+        self.overwritten = 0
+        self.rate_limited = 0
+        self.written = 0
+
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def emit(self, event: Event):
+        now = time.time()
+        window = self.windows.get(event.kind)
+        if window is None or now - window[0] >= 1.0:
+            window = self.windows[event.kind] = [now, 0]
+        if window[1] >= self.rate_limits.get(event.kind, self.default_rate):
+            self.rate_limited += 1
+            return
+        window[1] += 1
+
+        if len(self.ring) == self.ring.maxlen:
+            self.overwritten += 1
+        self.ring.append((now, event))
+        self.emitted += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, daemon=True, name="EventLog")
+        self._thread.start()
+        return self._thread
+
+    def run(self):
+        f = open(self.path, 'a') if self.path else None
+        try:
+            while not self._stopping.wait(self.flush_interval):
+                self.drain(f)
+            self.drain(f)  # Whatever was emitted up to stop()
+        finally:
+            if f:
+                f.close()
+
+    def stop(self, timeout=2.0):
+        """Write out everything emitted so far and stop the writer"""
+        self._stopping.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        elif self.path:
+            with open(self.path, 'a') as f:
+                self.drain(f)
+        else:
+            self.drain()
+
+    def drain(self, f=None):
+        lines = []
+        while self.ring:
+            now, event = self.ring.popleft()
+            if f:
+                lines.append(json.dumps({'kind': event.kind, 'time': round(now, 3), **asdict(event)},
+                                        separators=(',', ':')))
+            if self.echo and event.echo:
+                print(event.message())
+            self.written += 1
+        if f and lines:
+            f.write('\n'.join(lines) + '\n')
+            f.flush()
+
+    def stats(self) -> dict:
+        return {
+            'emitted': self.emitted,
+            'written': self.written,
+            'overwritten': self.overwritten,
+            'rate_limited': self.rate_limited,
+        }
@@ -0,0 +1,171 @@
+"""Client frame timing and frame pacing.
+
+FrameTimer splits every frame into stages:
+    wait     pacing sleep before the frame starts
+    network  reading the state file (an SFTP round trip for the remote client)
+    decode   decompressing and rebuilding the snapshot
+    input    writing the input file (another round trip)
+    render   drawing
+    present  display flip
+and keeps percentiles over the last few seconds (the F3 overlay) plus a
+longer per-frame trace that can be dumped to a JSON-lines file (F4).
+
+Each frame also records whether it showed a new snapshot, how many
+snapshots were overwritten before the client read them, and the age of the
+shown snapshot. Repeated frames and skipped snapshots are what judder looks
+like: with the client's 60 fps beating against the server's 62.5 Hz, a
+snapshot is lost every ~0.5 s and the frame that follows jumps twice as far.
+
+FramePacer replaces a fixed clock.tick(60). It learns the snapshot interval
+from the server's timestamps and the shortest delay before a snapshot can
+be read, and starts each frame just after the next snapshot should have
+landed, at a whole number of frames per snapshot. The server sends on its
+tick grid, so gaps are a mix of whole ticks (16 and 32 ms at 60 Hz): the
+interval is the median gap, not the mean, or frames drift late and land
+after two snapshots. A frame that started late (a late wake, a stale read)
+is followed by the next grid slot even if it is close, for the same reason.
+"""
+import json
+import math
+import time
+from collections import deque
+
+STAGES = ('wait', 'network', 'decode', 'input', 'render', 'present')
+
+
+def percentiles(values, pcts=(50, 95, 99)):
+    ordered = sorted(values)
+    if not ordered:
+        return [0.0 for _ in pcts]
+    return [ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] for p in pcts]
+
+
+class FrameTimer:
+    def __init__(self, window=300, trace_frames=18000):
+        self.recent = deque(maxlen=window)       # Overlay percentiles (~5 s at 60 fps)
+        self.trace = deque(maxlen=trace_frames)  # What dump() writes (~5 min)
+        self.frames = 0
+        self.last_seq = None
+        self.frame = None
+        self.started = self.mark = time.perf_counter()
+        self._lines = []
+
+    def begin(self):
+        self.started = self.mark = time.perf_counter()
+        self.frame = dict.fromkeys(STAGES, 0.0)
+
+    def lap(self, stage, **parts):
+        """Charge the time since the last lap to stage. parts are sub-stages
+        timed inside it (ms), e.g. lap('network', decode=1.2)"""
+        now = time.perf_counter()
+        ms = (now - self.mark) * 1000
+        for name, part_ms in parts.items():
+            self.frame[name] += part_ms
+            ms -= part_ms
+        self.frame[stage] += ms
+        self.mark = now
+
+    def end(self, state=None, new_state=False):
+        skipped = 0
+        seq = state.get('seq') if state else None
+        if new_state and seq is not None:
+            if self.last_seq is not None and seq > self.last_seq:
+                skipped = seq - self.last_seq - 1
+            self.last_seq = seq
+
+        record = {'frame': self.frames, 'time': round(time.time(), 4)}
+        record.update((name, round(ms, 3)) for name, ms in self.frame.items())
+        record['total'] = round((time.perf_counter() - self.started) * 1000, 3)
+        record['new'] = new_state
+        record['skipped'] = skipped
+        record['age_ms'] = round((time.time() - state['timestamp']) * 1000, 2) if state and 'timestamp' in state else None
+        self.recent.append(record)
+        self.trace.append(record)
+        self.frames += 1
+
+    def summary(self) -> dict:
+        frames = list(self.recent)
+        seconds = sum(f['total'] for f in frames) / 1000
+        stage_ms = {}
+        for name in STAGES + ('total',):
+            p50, p95, p99 = percentiles([f[name] for f in frames])
+            stage_ms[name] = {'p50': round(p50, 2), 'p95': round(p95, 2), 'p99': round(p99, 2)}
+        ages = [f['age_ms'] for f in frames if f['age_ms'] is not None]
+        age_p50, age_p99 = percentiles(ages, (50, 99))
+        return {
+            'fps': round(len(frames) / seconds, 1) if seconds else 0,
+            'stage_ms': stage_ms,
+            'repeat_pct': round(sum(not f['new'] for f in frames) / len(frames) * 100, 1) if frames else 0,
+            'skipped_per_s': round(sum(f['skipped'] for f in frames) / seconds, 2) if seconds else 0,
+            'age_ms': {'p50': round(age_p50, 1), 'p99': round(age_p99, 1)},
+        }
+
+    def overlay_lines(self, every=30) -> list[str]:
+        """Text for the debug overlay, recomputed every `every` frames"""
+        if self.frames % every == 0 or not self._lines:
+            s = self.summary()
+            self._lines = [f"{s['fps']:.0f} fps   p50 / p95 / p99 ms"]
+            for name, p in s['stage_ms'].items():
+                self._lines.append(f"{name:<8} {p['p50']:6.2f} {p['p95']:6.2f} {p['p99']:6.2f}")
+            self._lines.append(f"repeat {s['repeat_pct']:.0f}%  skipped {s['skipped_per_s']:.1f}/s")
+            self._lines.append(f"snapshot age {s['age_ms']['p50']:.0f} / {s['age_ms']['p99']:.0f} ms")
+        return self._lines
+
+    def dump(self, path) -> int:
+        with open(path, 'w') as f:
+            for record in self.trace:
+                f.write(json.dumps(record) + '\n')
+        return len(self.trace)
+
+
+class FramePacer:
+    def __init__(self, fps=60, adaptive=True, margin_ms=1.0):
+        self.fps = fps
+        self.adaptive = adaptive
+        self.margin = margin_ms / 1000
+        self.interval = 1 / fps
+        self.snapshot_interval = None
+        self.gaps = deque(maxlen=31)     # Recent snapshot gaps, per seq
+        self.last_ts = None
+        self.last_seq = None
+        self.delays = deque(maxlen=120)  # When we saw a snapshot minus its server timestamp
+        self.previous = None             # Start of the previous frame
+
+    def on_snapshot(self, state, seen):
+        """A new snapshot was read; seen is the time.time() the read started"""
+        ts, seq = state.get('timestamp'), state.get('seq')
+        if ts is None:
+            return
+        if self.last_ts is not None and seq and self.last_seq and seq > self.last_seq:
+            gap = (ts - self.last_ts) / (seq - self.last_seq)
+            if 0 < gap < 0.5:  # Not an idle heartbeat or a server restart
+                self.gaps.append(gap)
+                self.snapshot_interval = sorted(self.gaps)[len(self.gaps) // 2]
+        self.last_ts, self.last_seq = ts, seq
+        self.delays.append(seen - ts)  # Includes any clock offset to the server, which is constant
+
+    def next_frame(self, now):
+        if not (self.adaptive and self.snapshot_interval and len(self.delays) >= 10):
+            self.interval = 1 / self.fps
+            return self.previous + self.interval
+
+        # A whole number of frames per snapshot, as close to the target fps as it gets
+        per_snapshot = max(1, round(self.snapshot_interval * self.fps))
+        self.interval = self.snapshot_interval / per_snapshot
+        # Frames sit on a grid through the moment the latest snapshot became readable
+        anchor = self.last_ts + min(self.delays) + self.margin
+        k = math.ceil((self.previous + self.interval / 4 - anchor) / self.interval)
+        return anchor + k * self.interval
+
+    def wait(self):
+        """Sleep until the next frame should start."""
+        now = time.time()
+        if self.previous is None:
+            self.previous = now
+            return
+        target = self.next_frame(now)
+        if target < now - self.interval:
+            target = now  # Fell more than a frame behind: start now instead of bursting to catch up
+        if target > now:
+            time.sleep(target - now)
+        self.previous = time.time()  # When the frame really starts, after any oversleep
@@ -1,67 +1,65 @@
-import pygame
-import json
+import argparse
 import time
-from collections import deque
+
+from frame_timing import FramePacer, FrameTimer
+from net_protocol import GameConnection, player_path
+
+STARTED = time.perf_counter()  # Startup-to-first-state is measured from here
+pygame = None  # Imported when the window opens, so headless runs never load it
 
 class RiverRaidClientLocal:
-    def __init__(self):
+    def __init__(self, headless=False, player=0, pacing='adaptive', frame_trace=None, overlay=False):
         print("Starting local test client...")
+        self.headless = headless
+        self.player = player
+        self.timer = FrameTimer()
+        self.pacer = FramePacer(adaptive=pacing == 'adaptive')
+        self.frame_trace = frame_trace
+        self.show_overlay = overlay
+        self.window_ms = None
+        self.first_state_ms = None
+        
+        if not headless:
+            self._init_window()
+        
+        self.connection = GameConnection(player_path('player_input.json', player), player_path('game_state.json', player))
+    
+    def _init_window(self):
+        global pygame
+        import pygame
+        from terrain_layer import TerrainLayer
         
         pygame.init()
         self.screen = pygame.display.set_mode((800, 600))
         pygame.display.set_caption("River Raid - Local Test")
-        self.clock = pygame.time.Clock()
         self.font = pygame.font.Font(None, 36)
         self.small_font = pygame.font.Font(None, 24)
-        
-        self.ping_history = deque(maxlen=60)
-        
-        self.last_good_state = None
+        self.terrain = TerrainLayer()
+        self.window_ms = (time.perf_counter() - STARTED) * 1000
         
     def send_input(self, dx, speed, shoot, restart = False):
-        """Write input to local file"""
-        start = time.time()
         try:
-            data = {
-                'dx': dx,
-                'speed': speed,
-                'shoot': shoot,
-                'restart': restart,
-                'timestamp': time.time()
-            }
-            
-            with open('player_input.json', 'w') as f:
-                json.dump(data, f)
-            
-            rtt = (time.time() - start) * 1000
-            self.ping_history.append(rtt)
+            self.connection.send_input(dx, speed, shoot, restart)
         except Exception as e:
             print(f"Input error: {e}")
     
     def fetch_game_state(self):
-        try:
-            with open('game_state.json', 'r') as f:
-                data = f.read()
-                if data:
-                    self.last_good_state = json.loads(data)
-                    return self.last_good_state
-        except:
-            pass
-        return self.last_good_state
+        state = self.connection.fetch_game_state()
+        if self.connection.new_state:
+            self.pacer.on_snapshot(state, self.connection.read_started)
+        if state is not None and self.first_state_ms is None:
+            self.first_state_ms = (time.perf_counter() - STARTED) * 1000
+            window = f"window ready at {self.window_ms:.0f} ms" if self.window_ms else "headless"
+            print(f"First state {self.first_state_ms:.0f} ms after start ({window})")
+        return state
     
     def render(self, state):
         if state is None:
-            pygame.display.flip()
             return
-        # River background
-        self.screen.fill((20, 120, 200))
+        # River and walls (land) - cached, only rows scrolling into view are drawn
+        self.terrain.draw(self.screen, state.get('river_offset', 0), state.get('river_spans', []))
         
         if state:
-            # River walls (land)
-            walls = state.get('river_walls', {'left': 0, 'right': 800})
-            pygame.draw.rect(self.screen, (34, 139, 34), (0, 0, int(walls['left']), 600))
-            pygame.draw.rect(self.screen, (34, 139, 34), (int(walls['right']), 0, 800 - int(walls['right']), 600))
-            
             # Fuel depots
             for depot in state.get('fuel_depots', []):
                 pygame.draw.rect(self.screen, (255, 255, 255), (depot['x'] - 25, depot['y'], 50, 80))
@@ -100,11 +98,22 @@ class RiverRaidClientLocal:
                 j_label = self.font.render('J', True, (0, 0, 0))
                 self.screen.blit(j_label, (j['x'] - 8, j['y'] - 8))
             
-            # Bullet
-            if state.get('bullet'):
-                bullet = state['bullet']
+            # Bullets (everyone's in a multiplayer world)
+            for bullet in state.get('bullets') or ([state['bullet']] if state.get('bullet') else []):
                 pygame.draw.rect(self.screen, (255, 255, 0), (bullet['x'] - 2, bullet['y'], 4, 15))
             
+            # Other players
+            for i, other in enumerate(state.get('players', [])):
+                if i == self.player or not other['active']:
+                    continue
+                pygame.draw.polygon(self.screen, (120, 170, 255), [
+                    (other['x'], other['y'] - 20),
+                    (other['x'] - 15, other['y'] + 20),
+                    (other['x'] + 15, other['y'] + 20)
+                ])
+                o_label = self.small_font.render(str(i), True, (0, 0, 0))
+                self.screen.blit(o_label, (other['x'] - 4, other['y']))
+            
             # Player (A)
             p = state['player']
             pygame.draw.polygon(self.screen, (255, 255, 255), [
@@ -125,8 +134,10 @@ class RiverRaidClientLocal:
             
             score_text = self.font.render(f"Score: {p['score']}", True, (255, 255, 255))
             
-            avg_ping = sum(self.ping_history) / len(self.ping_history) if self.ping_history else 0
-            ping_text = self.small_font.render(f"Latency: {avg_ping:.1f}ms", True, (255, 255, 0))
+            # Input -> server -> snapshot round trip; the input write alone is in the F3 overlay
+            rtt = self.connection.receiver.rtt_ms
+            ping_text = self.small_font.render(f"RTT: {rtt:.0f}ms" if rtt is not None else "RTT: -",
+                                               True, (255, 255, 0))
             
             self.screen.blit(lives_text, (10, 10))
             self.screen.blit(fuel_text, (220, 52))
@@ -154,8 +165,6 @@ class RiverRaidClientLocal:
                 restart_text = self.small_font.render("Press R to Restart", True, (200, 200, 200))
                 restart_rect = restart_text.get_rect(center=(400, 400))
                 self.screen.blit(restart_text, restart_rect)
-        
-        pygame.display.flip()
     
     def run(self):
         running = True
@@ -163,52 +172,116 @@ class RiverRaidClientLocal:
         
         while running:
             frame_count += 1
+            self.timer.begin()
+            self.pacer.wait()
+            self.timer.lap('wait')
+            
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     running = False
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                    self.show_overlay = not self.show_overlay
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_F4:
+                    self.dump_frame_trace()
             
             keys = pygame.key.get_pressed()
             
+            # Fetch state (once per frame; the pacer starts frames just after a snapshot lands)
             state = self.fetch_game_state()
+            self.timer.lap('network', decode=self.connection.decode_ms)
+            
             if state and state.get('game_over'):
                 restart = keys[pygame.K_r]
                 self.send_input(0, 0, False, restart)
-                self.render(state)
-                continue
-            
-            # Movement
-            dx = 0
-            if keys[pygame.K_LEFT]:
-                dx = -5
-            if keys[pygame.K_RIGHT]:
-                dx = 5
+            else:
+                # Movement
+                dx = 0
+                if keys[pygame.K_LEFT]:
+                    dx = -5
+                if keys[pygame.K_RIGHT]:
+                    dx = 5
+                    
+                # Speed Control
+                speed = 0
+                if keys[pygame.K_UP]:
+                    speed = 1
+                if keys[pygame.K_DOWN]:
+                    speed = -1
+                    
+                # Shooting
+                shoot = keys[pygame.K_SPACE]
                 
-            # Speed Control
-            speed = 0
-            if keys[pygame.K_UP]:
-                speed = 1
-            if keys[pygame.K_DOWN]:
-                speed = -1
-                
-            # Shooting
-            shoot = keys[pygame.K_SPACE]
-            
-            # Send to server (local file)
-            self.send_input(dx, speed, shoot, False)
-            
-            # Fetch state
-            state = self.fetch_game_state()
+                # Send to server (local file)
+                self.send_input(dx, speed, shoot, False)
+            self.timer.lap('input')
             
             if state is None:
                 print(f"Frame {frame_count}: STATE IS NONE!")
             
             # Render
             self.render(state)
+            if self.show_overlay:
+                self.draw_overlay()
+            self.timer.lap('render')
             
-            self.clock.tick(60)
+            pygame.display.flip()
+            self.timer.lap('present')
+            self.timer.end(state, self.connection.new_state)
         
+        if self.frame_trace:
+            self.dump_frame_trace()
         pygame.quit()
+    
+    def draw_overlay(self):
+        """F3: frame time breakdown over the last ~5 seconds"""
+        for i, line in enumerate(self.timer.overlay_lines()):
+            text = self.small_font.render(line, True, (255, 255, 255), (0, 0, 0))
+            self.screen.blit(text, (500, 40 + i * 18))
+    
+    def dump_frame_trace(self):
+        path = self.frame_trace or 'frame_trace.jsonl'
+        count = self.timer.dump(path)
+        print(f"Wrote {count} frames to {path}")
+    
+    def run_headless(self, seconds=None):
+        """No window: poll the state with neutral input, paced and timed like a windowed
+        client, restarting after game over. Stops after `seconds` (None: never), but not
+        before the first state arrives"""
+        end = None if seconds is None else time.perf_counter() + seconds
+        
+        while self.first_state_ms is None or end is None or time.perf_counter() < end:
+            self.timer.begin()
+            self.pacer.wait()
+            self.timer.lap('wait')
+            state = self.fetch_game_state()
+            self.timer.lap('network', decode=self.connection.decode_ms)
+            self.send_input(0, 0, False, bool(state and state.get('game_over')))
+            self.timer.lap('input')
+            self.timer.end(state, self.connection.new_state)
+        
+        s = self.timer.summary()
+        print(f"{self.timer.frames} frames at {s['fps']} fps, first state at {self.first_state_ms:.0f} ms, "
+              f"input write p50 {s['stage_ms']['input']['p50']} ms, {s['repeat_pct']}% repeated frames, "
+              f"{s['skipped_per_s']} skipped snapshots/s, snapshot age p50 {s['age_ms']['p50']} ms")
+        if self.frame_trace:
+            self.dump_frame_trace()
 
 if __name__ == '__main__':
-    client = RiverRaidClientLocal()
-    client.run()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="River Raid local test client")
+    parser.add_argument('--headless', action='store_true', help="No window or pygame, neutral input (CI, bots)")
+    parser.add_argument('--seconds', type=float, help="Headless: stop after this long (0: at the first state)")
+    parser.add_argument('--player', type=int, default=0,
+                        help="Which player to be when the server runs with --players (0 is the first)")
+    parser.add_argument('--pacing', choices=('adaptive', 'fixed'), default='adaptive',
+                        help="adaptive: start frames just after snapshots arrive, fixed: a plain 60 fps")
+    parser.add_argument('--overlay', action='store_true', help="Start with the F3 frame timing overlay on")
+    parser.add_argument('--frame-trace', metavar='PATH',
+                        help="Per-frame timing trace written on F4 and on exit (default for F4: frame_trace.jsonl)")
+    args = parser.parse_args()
+    
+    client = RiverRaidClientLocal(headless=args.headless, player=args.player, pacing=args.pacing,
+                                  frame_trace=args.frame_trace, overlay=args.overlay)
+    if args.headless:
+        client.run_headless(args.seconds)
+    else:
+        client.run()
\ No newline at end of file
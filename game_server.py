@@ -4,16 +4,58 @@ import threading
 import json
 import time
 import random
-from dataclasses import dataclass, asdict
+import argparse
+import itertools
+from collections import deque
+from dataclasses import dataclass, asdict, field
+from functools import partial
 from typing import List, Optional
 
+from checkpoints import CheckpointWriter, load_checkpoint
+from collision import bullets_vs_targets, ships_vs_world
+from event_log import (Checkpoint, Death, EventLog, GameOver, Reset, Respawn, Spawn,
+                       Status)
+from net_protocol import (ClientChannel, Compressor, load_dictionary, next_deadline, player_path,
+                          DICTIONARY_PATH)
+from profiler import SamplingProfiler
+from scheduler import MultiRateScheduler
+from timer_wheel import Timer, TimerWheel
+from spectators import SpectatorHub, SPECTATOR_HOST, SPECTATOR_PORT
+from telemetry import TelemetryRecorder
+
 # File paths
 if platform.system() == 'Windows':
     GAME_STATE_PATH = 'game_state.json'
     PLAYER_INPUT_PATH = 'player_input.json'
+    METRICS_PATH = 'server_metrics.json'
+    CHECKPOINT_PATH = 'world_checkpoint.json'
+    EVENT_LOG_PATH = 'server_events.jsonl'
+    PROFILE_DIR = '.'
+    PROFILE_CONTROL_PATH = 'server_profile'
 else:
     GAME_STATE_PATH = '/tmp/game_state.json'
     PLAYER_INPUT_PATH = '/tmp/player_input.json'
+    METRICS_PATH = '/tmp/server_metrics.json'
+    CHECKPOINT_PATH = '/tmp/world_checkpoint.json'
+    EVENT_LOG_PATH = '/tmp/server_events.jsonl'
+    PROFILE_DIR = '/tmp'
+    PROFILE_CONTROL_PATH = '/tmp/server_profile'
+
+TICK_SECONDS = 0.016
+TICK_RATE = 1 / TICK_SECONDS
+RESPAWN_SECONDS = 2.0
+SPECTATOR_INTERVAL = 1 / 30  # Spectator frame rate, below the tick rate
+VIEW_HEIGHT = 600            # Rows of river the clients show, and get bank spans for
+
+# While respawning or after game over the world stands still: spawn and sim
+# stop, input is only checked for a restart and snapshots become a heartbeat
+IDLE_INPUT_RATE = 10
+IDLE_REPLICATION_RATE = 1
+
+# Multiplayer: 'coop' ends when every player is out of lives, 'versus' when one is left
+GAME_MODES = ('coop', 'versus')
+
+_entity_ids = itertools.count(1)
 
 @dataclass
 class Entity:
@@ -22,16 +64,23 @@ class Entity:
     width: float = 30
     height: float = 30
     alive: bool = True
+    entity_id: int = field(default_factory=lambda: next(_entity_ids))
     
     def collides_with(self, other: 'Entity') -> bool:
-        return (abs(self.x - other.x) < (self.width + other.width) / 2 and 
-                abs(self.y - other.y) < (self.height + other.height) / 2)
+        return self.collides_at(other, other.x, other.y)
+    
+    def collides_at(self, other: 'Entity', x: float, y: float) -> bool:
+        """Collision with other as if it were at (x, y)"""
+        return (abs(self.x - x) < (self.width + other.width) / 2 and 
+                abs(self.y - y) < (self.height + other.height) / 2)
 
 @dataclass
 class Bullet(Entity):
     width: float = 5
     height: float = 15
     speed: float = -10
+    rewind_ticks: int = 0  # Lag compensation: hits are checked against the world this many ticks ago
+    owner: int = 0         # player_id of the shooter
     
     def update(self, scroll_speed):
         self.y += self.speed
@@ -50,6 +99,8 @@ class Player(Entity):
     lives: int = 3
     score: int = 0
     invincible_timer: float = 0
+    player_id: int = 0
+    active: bool = True  # In the world now (False while dead or waiting to respawn)
     
     def move(self, dx):
         self.x += dx
@@ -145,18 +196,217 @@ class RiverSegment:
         right_wall = self.center_x + self.width / 2
         return (left_wall, right_wall)
 
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(len(ordered) * pct / 100))
+    return ordered[index]
+
+def player_view(state, player):
+    """Player N's copy of a snapshot: its own ship, bullet and input echo go in
+    the single-player fields, so every client reads the same format"""
+    if not player:
+        return state
+    me = state['players'][player]
+    bullet = next(({'x': b['x'], 'y': b['y']} for b in state['bullets'] if b['owner'] == player), None)
+    return {**state,
+            'respawning': me['respawning'],
+            'player': {k: me[k] for k in ('x', 'y', 'fuel', 'lives', 'score')},
+            'bullet': bullet,
+            'input_ts': me['input_ts'],
+            'input_seq': me['input_seq']}
+
+def write_state_file(path, data):
+    """Clients poll the state file, and a paced client reads it right when a
+    snapshot lands. Writing it in place leaves it empty between the truncate
+    and the write, and a read then misses that snapshot; write a temp file
+    and rename it over instead."""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    try:
+        os.replace(tmp_path, path)
+    except PermissionError:  # Windows, while a client has the file open
+        with open(path, 'wb') as f:
+            f.write(data)
+
+def write_metrics(metrics, path=METRICS_PATH):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(metrics, f, indent=2)
+    os.replace(tmp_path, path)
+
+class Replicator:
+    """Encodes snapshots for each player's state file and for spectators.
+    
+    It never touches the world itself: step() is handed a snapshot source, so
+    the same code serves the single-process server and the split-process I/O side.
+    """
+    def __init__(self, spectator_host=SPECTATOR_HOST, spectator_port=SPECTATOR_PORT,
+                 snapshot_dict=DICTIONARY_PATH, compress_level=6, record_snapshots=None,
+                 state_path=GAME_STATE_PATH, players=1):
+        self.state_paths = [player_path(state_path, i) for i in range(players)]
+        
+        # Snapshot compression, used for clients that negotiate it
+        self.compressor = Compressor(load_dictionary(snapshot_dict), compress_level)
+        
+        # Spectator fan-out (port 0 disables it)
+        self.spectators: Optional[SpectatorHub] = None
+        if spectator_port:
+            self.spectators = SpectatorHub(spectator_host, spectator_port, compressor=self.compressor)
+        
+        # Snapshot stream to each player, rate and detail adapt to the link
+        self.channels = [ClientChannel(f'player{i}' if i else 'player', compressor=self.compressor)
+                         for i in range(players)]
+        
+        # Optional JSON-lines recording of replicated snapshots (dictionary training input)
+        self.snapshot_recording = open(record_snapshots, 'a', buffering=1) if record_snapshots else None
+        
+        self.next_spectator_frame = 0.0
+        self.idle = False  # World stopped (respawn, game over): heartbeat snapshots, no rate adaptation
+        
+        # (player, input seq) -> when the server read it, until a snapshot carrying it goes out
+        self.input_received: dict[tuple, float] = {}
+        self.input_latency_ms = deque(maxlen=1000)
+    
+    def step(self, get_snapshot, get_feedback) -> bool:
+        """Send whatever is due and return whether any player got a snapshot.
+        get_snapshot() returns the current state dict (or None if there is none
+        yet), get_feedback(player) that player's latest input message"""
+        now = time.time()
+        due = []
+        for player, channel in enumerate(self.channels):
+            channel.on_feedback(get_feedback(player), now, adapt=not self.idle)
+            if channel.due(now):
+                due.append(player)
+        
+        send_spectators = self.spectators is not None and now >= self.next_spectator_frame
+        if not (due or send_spectators):
+            return False
+        
+        state = get_snapshot()
+        if state is None:
+            return False  # No world to replicate yet
+        
+        # Each player gets its own rate/precision/delta/compression encoding
+        for player in due:
+            view = player_view(state, player)
+            write_state_file(self.state_paths[player], self.channels[player].encode(view, now))
+            self._note_replicated(player, view.get('input_seq'))
+        if due and self.snapshot_recording:
+            self.snapshot_recording.write(json.dumps(state) + '\n')
+        
+        # Spectators: encode once (outside the lock) and hand the same
+        # buffer to every socket
+        if send_spectators:
+            self.spectators.broadcast((json.dumps(state) + '\n').encode())
+            self.next_spectator_frame = next_deadline(self.next_spectator_frame, SPECTATOR_INTERVAL, now)
+        return bool(due)
+    
+    def note_input(self, seq, player=0):
+        """The server just read input seq from a client"""
+        if seq is not None:
+            self.input_received[player, seq] = time.perf_counter()
+    
+    def _note_replicated(self, player, seq):
+        received = self.input_received.pop((player, seq), None)
+        if received is not None:
+            self.input_latency_ms.append((time.perf_counter() - received) * 1000)
+        for old in [k for k in self.input_received if seq is not None and k[0] == player and k[1] < seq]:
+            del self.input_received[old]
+    
+    def metrics(self):
+        return {
+            'replication': {channel.client_id: channel.stats() for channel in self.channels},
+            'spectators': self.spectators.stats() if self.spectators else None,
+            'input_to_snapshot_ms': {
+                'p50': round(percentile(self.input_latency_ms, 50), 2),
+                'p95': round(percentile(self.input_latency_ms, 95), 2),
+                'p99': round(percentile(self.input_latency_ms, 99), 2),
+            },
+        }
+    
+    def start(self):
+        if self.spectators:
+            self.spectators.start()
+    
+    def close(self):
+        if self.spectators:
+            self.spectators.close()
+
 class GameServer:
-    def __init__(self):
+    def __init__(self, spectator_host=SPECTATOR_HOST, spectator_port=SPECTATOR_PORT,
+                 snapshot_dict=DICTIONARY_PATH, compress_level=6, record_snapshots=None,
+                 max_rewind_ms=200, checkpoint_path=CHECKPOINT_PATH, checkpoint_interval=1.0,
+                 state_path=GAME_STATE_PATH, input_path=PLAYER_INPUT_PATH, metrics_path=METRICS_PATH,
+                 event_log_path=EVENT_LOG_PATH, telemetry_dir=None, profile_dir=PROFILE_DIR, profile_rate=100,
+                 tick_rate=TICK_RATE, spawn_rate=TICK_RATE, input_rate=TICK_RATE, replication_rate=TICK_RATE,
+                 players=1, mode='coop'):
         self.state_lock = threading.Lock()
+        self.metrics_path = metrics_path
         
-        self.respawning = False
-        self.respawn_timer = 0
+        # One input file per player; only files whose mtime or size changed are read
+        self.input_paths = [player_path(input_path, i) for i in range(players)]
+        self._input_stamps: list[Optional[tuple]] = [None] * players
+        self._last_input_raw: list[Optional[bytes]] = [None] * players
+        
+        # Phase rates for the scheduler (game speed scales with tick_rate)
+        self.tick_rate = tick_rate
+        self.spawn_rate = spawn_rate
+        self.input_rate = input_rate
+        self.replication_rate = replication_rate
+        self.scheduler: Optional[MultiRateScheduler] = None
+        
+        # Deaths, spawns, checkpoints... - never print under state_lock, emit here instead
+        self.events = EventLog(event_log_path)
+        
+        # Optional per-tick samples for offline analysis, one file per server run
+        self.telemetry: Optional[TelemetryRecorder] = None
+        if telemetry_dir:
+            self.telemetry = TelemetryRecorder(os.path.join(telemetry_dir, f'session-{int(time.time())}.rrt'))
+        
+        # Off until SIGUSR1 or the control file turns it on
+        self.profiler = SamplingProfiler(profile_dir, PROFILE_CONTROL_PATH, profile_rate)
+        
+        # Periodic on-disk checkpoints of the whole world (interval 0 disables)
+        self.checkpoint_path = checkpoint_path
+        self.checkpoints: Optional[CheckpointWriter] = None
+        if checkpoint_path and checkpoint_interval:
+            self.checkpoints = CheckpointWriter(self, checkpoint_path, checkpoint_interval)
         
-        # Player 
-        self.player = Player()
+        # Simulation tick counter and recent positions of everything a bullet can hit,
+        # so shots can be checked against what the shooter was looking at
+        self.tick = 0
+        self.tick_overruns = 0
+        self.inputs_skipped = 0  # Client seqs overwritten before a tick applied them (outside pauses)
+        self._last_tick_start = None
+        self.tick_deadline = 1.5 / tick_rate  # A tick starting later than this after the previous one is an overrun
+        self.max_rewind_ticks = round(max_rewind_ms / 1000 * tick_rate)
+        self.position_history: dict[int, dict[int, tuple]] = {}
+        self.rewound_hits = 0
         
-        # Bullet 
-        self.bullet: Optional[Bullet] = None
+        # Snapshot encoding for the player's state file and spectators
+        self.replicator = Replicator(spectator_host, spectator_port, snapshot_dict,
+                                     compress_level, record_snapshots, state_path, players)
+        
+        self.respawning = False # Whole world paused: every ship is down at once
+        self.respawn_timer = 0  # Seconds left, only kept up to date in checkpoints
+        self._respawn: Optional[Timer] = None
+        self._player_respawns: dict[int, Timer] = {}  # Ships sitting out while the others fly on
+        # Without a scheduler (tests and benches calling tick_step directly) respawn
+        # timers run on a wheel whose clock is the number of tick_step calls
+        self._steps = 0
+        self._step_timers = TimerWheel(1 / tick_rate, clock=lambda: self._steps / self.tick_rate)
+        self.idle = False       # Spawn and sim phases paused
+        self._idle_sent = False # A snapshot of the idle world has gone out
+        
+        # Players, all sharing one world
+        self.mode = mode
+        self.players: List[Player] = self._new_players(players)
+        
+        # Bullets, at most one in flight per player
+        self.bullets: List[Bullet] = []
         
         # River terrain
         self.river_scroll_speed = 2  
@@ -191,8 +441,51 @@ class GameServer:
         
         # Game state
         self.game_over = False
-        self.pending_input = {'dx': 0, 'shoot': False}
-        
+        self.pending_inputs = [{'dx': 0, 'shoot': False} for _ in range(players)]
+        self.last_input_ts = [None] * players  # Client timestamp of the last applied input (echoed for RTT)
+        self.last_input_seq = [None] * players
+    
+    @property
+    def pending_input(self):
+        """Player 0's latest input (the only one in a single-player game)"""
+        return self.pending_inputs[0]
+    
+    @pending_input.setter
+    def pending_input(self, client_input):
+        self.pending_inputs[0] = client_input
+    
+    @staticmethod
+    def _spawn_x(player_id, players):
+        """Start positions spread across the middle of the river"""
+        return 400 + (player_id - (players - 1) / 2) * min(40, 240 / max(1, players - 1))
+    
+    def _new_players(self, players):
+        return [Player(x=self._spawn_x(i, players), player_id=i) for i in range(players)]
+    
+    def _ships(self):
+        return [p for p in self.players if p.active]
+    
+    def _walls_at(self, y):
+        """Banks on screen row y"""
+        row = int(y - self.river_y_offset)  # World row, screen y = world y + river offset
+        return self._segment_at(row).get_walls_at_y(row)
+    
+    def _segment_at(self, row):
+        """Segment i covers world rows i*100 to i*100+99, repeating along the river"""
+        return self.river_segments[row // 100 % len(self.river_segments)]
+    
+    def _river_spans(self):
+        """Banks for every world row on screen, top down: each span runs from its
+        'y' to the next span's (one per segment the view crosses)"""
+        top = -int(self.river_y_offset)
+        spans = []
+        row = top
+        while row < top + VIEW_HEIGHT:
+            left, right = self._segment_at(row).get_walls_at_y(row)
+            spans.append({'y': row, 'left': left, 'right': right})
+            row = (row // 100 + 1) * 100
+        return spans
+    
     def _generate_initial_river(self):
         for i in range(20): 
             width = 325 
@@ -212,240 +505,310 @@ class GameServer:
             bridge_id=self.bridge_counter
         )
         self.bridges.append(bridge)
+        self._emit_spawn("bridge", bridge)
     
-    def thread_H_helicopter(self):
-        print("[Thread H] Helicopter started")
-        while True:
-            with self.state_lock:
-                if not self.respawning and not self.game_over:
-                    if len(self.helicopters) < self.max_helicopters:
-                        if random.random() < 0.01:  
-                            self._spawn_enemy("helicopter")
-            time.sleep(0.016)
-    
-    def thread_J_jet(self):
-        print("[Thread J] Jet started")
-        while True:
-            with self.state_lock:
-                if not self.respawning and not self.game_over:
-                    if len(self.jets) < self.max_jets:
-                        if random.random() < 0.005:
-                            self._spawn_enemy("jet")
-            time.sleep(0.016)
-    
-    def thread_B_tanker(self):
-        print("[Thread B] Tanker started")
-        while True:
-            with self.state_lock:
-                if not self.respawning and not self.game_over:
-                    if len(self.tankers) < self.max_tankers:
-                        if random.random() < 0.01:  
-                            self._spawn_enemy("tanker")
-            time.sleep(0.016)
+    def _emit_spawn(self, entity_type, entity):
+        self.events.emit(Spawn(self.tick, entity_type, entity.entity_id, entity.x, entity.y))
+    
+    def spawn_step(self):
+        """Spawn phase: one roll per enemy type. Caller must hold state_lock"""
+        if self.respawning or self.game_over:
+            return
+        if len(self.helicopters) < self.max_helicopters and random.random() < 0.01:
+            self._spawn_enemy("helicopter")
+        if len(self.jets) < self.max_jets and random.random() < 0.005:
+            self._spawn_enemy("jet")
+        if len(self.tankers) < self.max_tankers and random.random() < 0.01:
+            self._spawn_enemy("tanker")
     
     def _spawn_enemy(self, enemy_type):
         x = random.randint(250, 500)
         y = -random.randint(200, 500)
         
         if enemy_type == "helicopter" and len(self.helicopters) < self.max_helicopters:
-            self.helicopters.append(Helicopter(x=x, y=y))
+            enemy = Helicopter(x=x, y=y)
+            self.helicopters.append(enemy)
         elif enemy_type == "tanker" and len(self.tankers) < self.max_tankers:
-            self.tankers.append(Tanker(x=x, y=y))
+            enemy = Tanker(x=x, y=y)
+            self.tankers.append(enemy)
         elif enemy_type == "jet" and len(self.jets) < self.max_jets:
             # Jet spawns from side, not top
             side = random.choice([-50, 850])
             direction = 1 if side < 0 else -1
-            self.jets.append(Jet(x=side, y=random.randint(100, 300), vx=3, direction=direction))
-    
-    def game_tick(self):
-        print("[Game Tick] Started")
-        while True:
-            while not self.game_over:
-                with self.state_lock:
-                    if self.respawning:
-                        self.respawn_timer -= 0.016
-                        if self.respawn_timer <= 0:
-                            self.respawning = False
-                            print("Respawn Complete")
-                        else:
-                            time.sleep(0.016)
-                            continue
-                    
-                    # Check invincibility timer
-                    if self.player.invincible_timer > 0:
-                        self.player.invincible_timer -= 0.016
-                    
-                    # Apply client input
-                    if self.pending_input:
-                        dx = self.pending_input.get('dx', 0)
-                        self.player.move(dx)
-                        
-                        speed_change = self.pending_input.get('speed', 0)
-                        
-                        if speed_change > 0:
-                            self.river_scroll_speed = min(3, self.river_scroll_speed + 0.1)
-                        elif speed_change < 0:
-                            self.river_scroll_speed = max(1, self.river_scroll_speed - 0.1)
-                        else:  
-                            default_speed = 2.0
-                            lerp_factor = 0.1 
-                            
-                            self.river_scroll_speed += (default_speed - self.river_scroll_speed) * lerp_factor
-                            
-                            if abs(self.river_scroll_speed - default_speed) < 0.01:
-                                self.river_scroll_speed = default_speed
-                        
-                        # Handle shooting
-                        if self.pending_input.get('shoot', False) and self.bullet is None:
-                            self.bullet = Bullet(x=self.player.x, y=self.player.y - 20)
-                    
-                    # Update bullet
-                    if self.bullet:
-                        self.bullet.update(self.river_scroll_speed)
-                        if not self.bullet.alive:
-                            self.bullet = None
-                    
-                    # Scroll river
-                    self.river_y_offset += self.river_scroll_speed
-                    
-                    # Fuel consumption
-                    self.player.fuel -= 0.06
-                    if self.player.fuel <= 0:
-                        self._handle_death("Out of fuel")
-                    
-                    # Get river boundaries (used multiple times below)
-                    river_position = self.river_y_offset
-                    segment_index = int(river_position / 100) % len(self.river_segments)
-                    current_segment = self.river_segments[segment_index]
-                    left_wall, right_wall = current_segment.get_walls_at_y(self.player.y)
-                    
-                    # Check wall collision
-                    if self.player.invincible_timer <= 0:
-                        if self.player.x - self.player.width/2 < left_wall or \
-                        self.player.x + self.player.width/2 > right_wall:
-                            self._handle_death("Hit riverbank")
-                    
-                    # Update helicopters
-                    for heli in self.helicopters[:]:
-                        heli.update(self.river_scroll_speed, self.player.y, self.last_checkpoint_bridge_id + 1)
-                        
-                        if heli.activated:
-                            if heli.x < left_wall + 30 or heli.x > right_wall - 30:
-                                heli.vx *= -1
-                        
-                        if heli.y > 650:
-                            self.helicopters.remove(heli)
-                    
-                    # Update tankers
-                    for tank in self.tankers[:]:
-                        tank.update(self.river_scroll_speed, self.player.y, self.last_checkpoint_bridge_id + 1)
-                        
-                        if tank.activated:
-                            if tank.x < left_wall + 40 or tank.x > right_wall - 40:
-                                tank.vx *= -1
-                        
-                        if tank.y > 650:
-                            self.tankers.remove(tank)
-                    
-                    # Update jets (fly across entire screen, ignore walls)
-                    for jet in self.jets[:]:
-                        jet.update(self.river_scroll_speed, self.player.y, self.last_checkpoint_bridge_id + 1)
-                        
-                        # Remove if scrolled off bottom
-                        if jet.y > 650:
-                            self.jets.remove(jet)
-                    
-                    # Fuel depot collision
-                    for depot in [d for d in self.fuel_depots if d.alive]:
-                        depot.update(self.river_scroll_speed)
-                        
-                        if self.player.collides_with(depot):
-                            self.player.fuel = min(100, self.player.fuel + depot.refuel_rate * 0.016)
-                        
-                        if self.bullet and self.bullet.collides_with(depot):
-                            self.player.score += depot.points_if_destroyed
-                            self.bullet = None
-                            depot.y = -random.randint(300, 600)
-                        
-                        if depot.y > 650:
-                            depot.y = -random.randint(300, 600)
-                            depot.x = random.randint(280, 520)
-                    
-                    # Bridge collision
-                    for bridge in [b for b in self.bridges if b.alive]:
-                        bridge.update(self.river_scroll_speed)
-                        
-                        if self.bullet and self.bullet.collides_with(bridge):
-                            self.player.score += bridge.points
-                            bridge.destroyed = True
-                            bridge.alive = False
-                            self.bullet = None
-                            self.last_checkpoint_bridge_id = bridge.bridge_id
-                            print(f"Bridge {bridge.bridge_id} destroyed. Checkpoint saved.")
-                            self._spawn_bridge()
-                        
-                        if not bridge.destroyed and self.player.invincible_timer <= 0:
-                            if self.player.collides_with(bridge):
-                                self._handle_death("Hit bridge")
-                    
-                    # Enemy collisions
-                    all_enemies = self.helicopters + self.tankers + self.jets
-                    
-                    for enemy in all_enemies:
-                        # Bullet destroys enemy
-                        if self.bullet and self.bullet.collides_with(enemy):
-                            self.player.score += enemy.points
-                            self.bullet = None
-                            
-                            # Remove enemy from list
-                            if isinstance(enemy, Helicopter):
-                                self.helicopters.remove(enemy)
-                            elif isinstance(enemy, Tanker):
-                                self.tankers.remove(enemy)
-                            elif isinstance(enemy, Jet):
-                                self.jets.remove(enemy)
-                        
-                        # Player collision
-                        if self.player.invincible_timer <= 0:
-                            if self.player.collides_with(enemy):
-                                self._handle_death(f"Hit {enemy.__class__.__name__}")
-                                self.player.invincible_timer = 2.0
-                                break
-                    
-                    # Check game over (AFTER all collisions)
-                    if self.player.lives <= 0:
-                        self.game_over = True
-                        print("=== GAME OVER ===")
-                        break
+            enemy = Jet(x=side, y=random.randint(100, 300), vx=3, direction=direction)
+            self.jets.append(enemy)
+        else:
+            return
+        self._emit_spawn(enemy_type, enemy)
+    
+    def tick_step(self):
+        """Sim phase: advance the world one tick. Caller must hold state_lock"""
+        if not self.scheduler:
+            self._steps += 1
+            self._step_timers.advance()
+        if self.game_over or self.respawning:
+            return  # Paused anyway; a timer or a restart input wakes it up
+        
+        self.tick += 1
+        tick_start = time.perf_counter()
+        playing = self._last_tick_start is not None  # Previous tick was not a pause
+        if playing and tick_start - self._last_tick_start > self.tick_deadline:
+            self.tick_overruns += 1
+        self._last_tick_start = tick_start
+        
+        # Check invincibility timers
+        for ship in self._ships():
+            if ship.invincible_timer > 0:
+                ship.invincible_timer -= 0.016
+        
+        # Apply client inputs
+        had_input = False
+        speed_change = 0
+        shooting = {b.owner for b in self.bullets}
+        for ship in self._ships():
+            client_input = self.pending_inputs[ship.player_id]
+            if not client_input:
+                continue
+            had_input = True
+            seq = client_input.get('seq')
+            last_seq = self.last_input_seq[ship.player_id]
+            if playing and seq and last_seq and seq > last_seq + 1:
+                self.inputs_skipped += seq - last_seq - 1
+            self.last_input_ts[ship.player_id] = client_input.get('timestamp')
+            self.last_input_seq[ship.player_id] = seq
+            ship.move(client_input.get('dx', 0))
+            speed_change += client_input.get('speed', 0)
+            
+            # Handle shooting
+            if client_input.get('shoot', False) and ship.player_id not in shooting:
+                self.bullets.append(Bullet(x=ship.x, y=ship.y - 20, owner=ship.player_id,
+                                           rewind_ticks=self._rewind_ticks(client_input)))
+        
+        # Scroll speed is shared, so the players' speed inputs are summed
+        if had_input:
+            if speed_change > 0:
+                self.river_scroll_speed = min(3, self.river_scroll_speed + 0.1)
+            elif speed_change < 0:
+                self.river_scroll_speed = max(1, self.river_scroll_speed - 0.1)
+            else:  
+                default_speed = 2.0
+                lerp_factor = 0.1 
                 
-                time.sleep(0.016)  # Outside the lock
+                self.river_scroll_speed += (default_speed - self.river_scroll_speed) * lerp_factor
+                
+                if abs(self.river_scroll_speed - default_speed) < 0.01:
+                    self.river_scroll_speed = default_speed
+        
+        # Update bullets
+        for bullet in self.bullets:
+            bullet.update(self.river_scroll_speed)
+        self.bullets = [b for b in self.bullets if b.alive]
+        
+        # Scroll river
+        self.river_y_offset += self.river_scroll_speed
+        
+        # Fuel consumption
+        for ship in self._ships():
+            ship.fuel -= 0.06
+            if ship.fuel <= 0:
+                self._handle_death(ship, "Out of fuel")
+        
+        # Get river boundaries (every ship flies on the same row)
+        ship_y = self.players[0].y
+        left_wall, right_wall = self._walls_at(ship_y)
+        
+        # Check wall collision
+        for ship in self._ships():
+            if ship.invincible_timer <= 0:
+                if ship.x - ship.width/2 < left_wall or \
+                ship.x + ship.width/2 > right_wall:
+                    self._handle_death(ship, "Hit riverbank")
+        
+        # Update helicopters
+        for heli in self.helicopters[:]:
+            heli.update(self.river_scroll_speed, ship_y, self.last_checkpoint_bridge_id + 1)
             
-            # Wait for restart input
-            print("[Game Tick] Waiting for restart input (press R)...")
-            while True:
-                with self.state_lock:
-                    if self.pending_input.get('restart', False):
-                        print("[Game Tick] Restart requested.")
-                        self.reset_game()
-                        break
-                time.sleep(0.1)
-
-            print("[Game Tick] Game restarting.\n")
+            if heli.activated:
+                if heli.x < left_wall + 30 or heli.x > right_wall - 30:
+                    heli.vx *= -1
+            
+            if heli.y > 650:
+                self.helicopters.remove(heli)
+        
+        # Update tankers
+        for tank in self.tankers[:]:
+            tank.update(self.river_scroll_speed, ship_y, self.last_checkpoint_bridge_id + 1)
+            
+            if tank.activated:
+                if tank.x < left_wall + 40 or tank.x > right_wall - 40:
+                    tank.vx *= -1
+            
+            if tank.y > 650:
+                self.tankers.remove(tank)
+        
+        # Update jets (fly across entire screen, ignore walls)
+        for jet in self.jets[:]:
+            jet.update(self.river_scroll_speed, ship_y, self.last_checkpoint_bridge_id + 1)
+            
+            # Remove if scrolled off bottom
+            if jet.y > 650:
+                self.jets.remove(jet)
+        
+        # Collisions are batched per kind of target (see collision.py), so their
+        # cost does not grow with players x entities
+        
+        # Fuel depots
+        depots = [d for d in self.fuel_depots if d.alive]
+        for depot in depots:
+            depot.update(self.river_scroll_speed)
+        
+        for ship, depot in ships_vs_world(self._ships(), depots):
+            ship.fuel = min(100, ship.fuel + depot.refuel_rate * 0.016)
+        
+        for bullet, depot in self._bullet_hits(depots):
+            self.players[bullet.owner].score += depot.points_if_destroyed
+            depot.y = -random.randint(300, 600)
+            self._forget_positions(depot)
+        
+        for depot in depots:
+            if depot.y > 650:
+                depot.y = -random.randint(300, 600)
+                depot.x = random.randint(280, 520)
+                self._forget_positions(depot)
+        
+        # Bridges
+        bridges = [b for b in self.bridges if b.alive]
+        for bridge in bridges:
+            bridge.update(self.river_scroll_speed)
+        
+        for bullet, bridge in self._bullet_hits(bridges):
+            self.players[bullet.owner].score += bridge.points
+            bridge.destroyed = True
+            bridge.alive = False
+            self.last_checkpoint_bridge_id = bridge.bridge_id
+            self.events.emit(Checkpoint(self.tick, bridge.bridge_id, sum(p.score for p in self.players)))
+            self._spawn_bridge()
+        
+        for ship, bridge in ships_vs_world(self._ships(), [b for b in bridges if not b.destroyed]):
+            if ship.active and ship.invincible_timer <= 0:
+                self._handle_death(ship, "Hit bridge")
+        
+        # Enemy collisions
+        enemies = self.helicopters + self.tankers + self.jets
+        
+        # Bullet destroys enemy
+        shot = set()
+        for bullet, enemy in self._bullet_hits(enemies):
+            self.players[bullet.owner].score += enemy.points
+            shot.add(enemy.entity_id)
+            
+            # Remove enemy from list
+            if isinstance(enemy, Helicopter):
+                self.helicopters.remove(enemy)
+            elif isinstance(enemy, Tanker):
+                self.tankers.remove(enemy)
+            elif isinstance(enemy, Jet):
+                self.jets.remove(enemy)
+        
+        # Player collision
+        for ship, enemy in ships_vs_world(self._ships(), [e for e in enemies if e.entity_id not in shot]):
+            if ship.active and ship.invincible_timer <= 0:
+                self._handle_death(ship, f"Hit {enemy.__class__.__name__}")
+                ship.invincible_timer = 2.0
+        
+        self._record_positions()
+        if self.telemetry:
+            self.telemetry.record(self)
+        
+        # Check game over (AFTER all collisions)
+        if self._out_of_players():
+            self.game_over = True
+            self.events.emit(GameOver(self.tick, sum(p.score for p in self.players)))
+            self._go_idle()
+    
+    def _out_of_players(self):
+        alive = sum(p.lives > 0 for p in self.players)
+        if self.mode == 'versus' and len(self.players) > 1:
+            return alive <= 1
+        return alive == 0
+    
+    def _winner(self):
+        """Versus: the last player with lives left, or the top scorer"""
+        return max(self.players, key=lambda p: (p.lives > 0, p.score)).player_id
+    
+    def _rewind_ticks(self, client_input):
+        """How far back the client's view was when it sent this input, capped at max rewind"""
+        view_tick = client_input.get('view_tick')
+        if view_tick is None or not self.max_rewind_ticks:
+            return 0
+        return max(0, min(self.tick - view_tick, self.max_rewind_ticks))
+    
+    def _record_positions(self):
+        targets = self.helicopters + self.tankers + self.jets + self.fuel_depots + self.bridges
+        self.position_history[self.tick] = {e.entity_id: (e.x, e.y) for e in targets}
+        while len(self.position_history) > self.max_rewind_ticks + 1:
+            del self.position_history[next(iter(self.position_history))]
+    
+    def _forget_positions(self, entity):
+        """Drop an entity's past positions once it is moved elsewhere (depots are
+        recycled, not removed), so a rewound bullet can't hit it where it was"""
+        for positions in self.position_history.values():
+            positions.pop(entity.entity_id, None)
+    
+    def _bullet_hits(self, targets):
+        """(bullet, target) hits, checking each bullet against the targets where its
+        shooter saw them. A bullet or target takes part in at most one hit, and
+        bullets that hit are used up"""
+        by_rewind: dict[int, list] = {}
+        for bullet in self.bullets:
+            by_rewind.setdefault(bullet.rewind_ticks, []).append(bullet)
+        
+        hits = []
+        hit_targets = set()
+        for rewind, bullets in by_rewind.items():
+            past = self.position_history.get(self.tick - rewind) if rewind else None
+            for bullet, target in bullets_vs_targets(bullets, targets, past):
+                if not bullet.alive or target.entity_id in hit_targets:
+                    continue
+                if rewind and not bullet.collides_with(target):
+                    self.rewound_hits += 1
+                bullet.alive = False
+                hit_targets.add(target.entity_id)
+                hits.append((bullet, target))
+        if hits:
+            self.bullets = [b for b in self.bullets if b.alive]
+        return hits
     
-    def _handle_death(self, reason: str):
-        self.player.lives -= 1
-        print(f"Death: {reason}. Lives remaining: {self.player.lives}")
+    def _handle_death(self, ship: Player, reason: str):
+        ship.lives -= 1
+        ship.active = False
+        self.events.emit(Death(self.tick, reason, ship.lives, ship.player_id))
+        if self.telemetry:
+            self.telemetry.note_death(reason)
+        self.bullets = [b for b in self.bullets if b.owner != ship.player_id]
+        
+        if self._ships():
+            # The others fly on; this ship sits out and comes back on its own
+            if ship.lives > 0:
+                self._player_respawns[ship.player_id] = self._schedule_respawn(
+                    RESPAWN_SECONDS, partial(self._finish_player_respawn, ship.player_id))
+            return
         
-        if self.player.lives > 0:
-            self.respawning = True
-            self.respawn_timer = 2.0
+        if any(p.lives > 0 for p in self.players):
+            # Nobody left flying: pause and reset the world, everyone comes back together
+            self._start_respawn(RESPAWN_SECONDS)
+            for timer in self._player_respawns.values():
+                timer.cancel()
+            self._player_respawns.clear()
             
-            self.player.y = 520
-            self.player.x = 400
-            self.player.fuel = 100.0
-            self.player.invincible_timer = 0.1
+            for player in self.players:
+                player.y = 520
+                player.x = self._spawn_x(player.player_id, len(self.players))
+                player.fuel = 100.0
+                player.invincible_timer = 0.1
             
-            self.bullet = None
+            self.bullets = []
+            self.position_history.clear()
             
             # Clear all enemies
             self.helicopters = [Helicopter(x=random.randint(250, 500), y=-random.randint(300, 600))]
@@ -459,67 +822,201 @@ class GameServer:
             for bridge in self.bridges:
                 if not bridge.destroyed:
                     bridge.y = -random.randint(500, 1000)
-            print(f"Respawning Player")   
     
-    def replicate_state(self):
-        print("[Replication] Started")
+    def _start_respawn(self, seconds):
+        """Caller must hold state_lock"""
+        self.respawning = True
+        self._respawn = self._schedule_respawn(seconds, self._finish_respawn)
+        self._go_idle()
+    
+    def _schedule_respawn(self, seconds, finish):
+        """Caller must hold state_lock, and finish runs holding it: on the scheduler
+        thread, or without a scheduler from a later tick_step"""
+        if self.scheduler:
+            return self.scheduler.timers.schedule(seconds, self._locked(finish))
+        return self._step_timers.schedule(seconds, finish)
+    
+    def _finish_respawn(self):
+        """Respawn timer. Caller must hold state_lock"""
+        self._respawn = None
+        self.respawning = False
+        if self.game_over:
+            return  # Versus ended while everyone was down: only a restart brings them back
+        self._last_tick_start = None
+        for player in self.players:
+            if player.lives > 0:
+                player.active = True
+                self.events.emit(Respawn(self.tick, player.player_id))
+        self._go_active()
+    
+    def _finish_player_respawn(self, player_id):
+        """One ship's respawn timer while the world kept going. Caller must hold state_lock"""
+        self._player_respawns.pop(player_id, None)
+        if self.respawning or self.game_over:
+            return  # A world respawn or a restart brings it back instead
+        player = self.players[player_id]
+        player.x = self._spawn_x(player_id, len(self.players))
+        player.fuel = 100.0
+        player.invincible_timer = 2.0
+        player.active = True
+        self.events.emit(Respawn(self.tick, player_id))
+    
+    def _go_idle(self):
+        if self.scheduler and not self.idle:
+            self.idle = True
+            self.replicator.idle = True
+            self._idle_sent = False
+            self.scheduler.pause('spawn', 'sim')
+            self.scheduler.set_rate('input', IDLE_INPUT_RATE)
+    
+    def _go_active(self):
+        if self.scheduler and self.idle:
+            self.idle = False
+            self.replicator.idle = False
+            self.scheduler.resume('spawn', 'sim')
+            self.scheduler.set_rate('input', self.input_rate)
+            self.scheduler.set_rate('replicate', self.replication_rate)
+    
+    def build_snapshot(self):
+        """Caller must hold state_lock"""
+        player = self.players[0]
         
-        while True: 
+        state = {
+            'respawning': self._respawning(player),
+            'player': {
+                'x': player.x,
+                'y': player.y,
+                'fuel': player.fuel,
+                'lives': player.lives,
+                'score': player.score,
+            },
+            'bullet': next(({'x': b.x, 'y': b.y} for b in self.bullets if b.owner == 0), None),
+            'helicopters': [{'x': h.x, 'y': h.y} for h in self.helicopters],
+            'tankers': [{'x': t.x, 'y': t.y} for t in self.tankers],
+            'jets': [{'x': j.x, 'y': j.y} for j in self.jets],
+            'fuel_depots': [{'x': d.x, 'y': d.y} for d in self.fuel_depots],
+            'bridges': [{'x': b.x, 'y': b.y, 'destroyed': b.destroyed, 'id': b.bridge_id} 
+                    for b in self.bridges if b.y > -50 and b.y < 650],
+            'river_spans': self._river_spans(),
+            'river_offset': self.river_y_offset,
+            'game_over': self.game_over,
+            'scroll_speed': self.river_scroll_speed,
+            'input_ts': self.last_input_ts[0],
+            'input_seq': self.last_input_seq[0],
+            'tick': self.tick,
+            'timestamp': time.time()
+        }
+        
+        # Everyone's ships and bullets; player_view() moves each player's own into the fields above
+        if len(self.players) > 1:
+            state['players'] = [{
+                'x': p.x, 'y': p.y, 'fuel': p.fuel, 'lives': p.lives, 'score': p.score,
+                'active': p.active, 'respawning': self._respawning(p),
+                'input_ts': self.last_input_ts[p.player_id], 'input_seq': self.last_input_seq[p.player_id],
+            } for p in self.players]
+            state['bullets'] = [{'x': b.x, 'y': b.y, 'owner': b.owner} for b in self.bullets]
+            state['mode'] = self.mode
+            if self.game_over and self.mode == 'versus':
+                state['winner'] = self._winner()
+        return state
+    
+    def _respawning(self, player):
+        return self.respawning or (not player.active and player.lives > 0)
+    
+    def read_input(self):
+        """Input phase: pick up each client's latest input file"""
+        for i, path in enumerate(self.input_paths):
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            stamp = (st.st_mtime_ns, st.st_size)
+            if stamp == self._input_stamps[i]:
+                continue  # Unchanged since the last poll, skip the read
+            try:
+                with open(path, 'rb') as f:
+                    raw = f.read()
+            except FileNotFoundError:
+                continue
+            if raw == self._last_input_raw[i]:
+                self._input_stamps[i] = stamp
+                continue
+            try:
+                client_input = json.loads(raw)
+            except ValueError:
+                continue  # Caught the client mid-write
+            self._input_stamps[i] = stamp
+            self._last_input_raw[i] = raw
+            self.replicator.note_input(client_input.get('seq'), i)
+            self.apply_input(client_input, i)
+    
+    def apply_input(self, client_input, player=0):
+        self.pending_inputs[player] = client_input
+        if self.game_over and client_input.get('restart', False):
             with self.state_lock:
-                # Get River Walls
-                river_position = self.river_y_offset
-                segment_index = int(river_position / 100) % len(self.river_segments)
-                current_segment = self.river_segments[segment_index]
-                left_wall, right_wall = current_segment.get_walls_at_y(self.player.y)
-                
-                state = {
-                    'respawning': self.respawning,
-                    'player': {
-                        'x': self.player.x,
-                        'y': self.player.y,
-                        'fuel': self.player.fuel,
-                        'lives': self.player.lives,
-                        'score': self.player.score,
-                    },
-                    'bullet': {'x': self.bullet.x, 'y': self.bullet.y} if self.bullet else None,
-                    'helicopters': [{'x': h.x, 'y': h.y} for h in self.helicopters],
-                    'tankers': [{'x': t.x, 'y': t.y} for t in self.tankers],
-                    'jets': [{'x': j.x, 'y': j.y} for j in self.jets],
-                    'fuel_depots': [{'x': d.x, 'y': d.y} for d in self.fuel_depots],
-                    'bridges': [{'x': b.x, 'y': b.y, 'destroyed': b.destroyed, 'id': b.bridge_id} 
-                            for b in self.bridges if b.y > -50 and b.y < 650],
-                    'river_walls': {'left': left_wall, 'right': right_wall},
-                    'game_over': self.game_over,
-                    'scroll_speed': self.river_scroll_speed,
-                    'timestamp': time.time()
-                }
-                
-                with open(GAME_STATE_PATH, 'w') as f:
-                    json.dump(state, f)
-            
-            time.sleep(0.033)
+                self.reset_game()
+                self._go_active()
     
-    def handle_client_rpc(self):
-        """Read client inputs"""
-        print("[Client RPC] Started")
+    def replicate_step(self):
+        """Replicate phase: snapshot under the lock, encode and send outside it"""
+        def snapshot():
+            with self.state_lock:
+                return self.build_snapshot()
         
-        while True:
-            try:
-                with open(PLAYER_INPUT_PATH, 'r') as f:
-                    self.pending_input = json.load(f)
-            except (FileNotFoundError, json.JSONDecodeError):
-                pass
-            
-            time.sleep(0.016)
+        sent = self.replicator.step(snapshot, lambda player: self.pending_inputs[player])
+        self._after_replicate(sent)
     
-    def reset_game(self):
-        print("[Game] Resetting game state...")
+    def _after_replicate(self, sent):
+        # Once the client has seen the world stop, drop to a heartbeat
+        if self.idle and sent and not self._idle_sent:
+            self._idle_sent = True
+            self.scheduler.set_rate('replicate', IDLE_REPLICATION_RATE)
+    
+    def _locked(self, step):
+        def run():
+            with self.state_lock:
+                step()
+        return run
+    
+    def build_scheduler(self, input_step=None, replicate_step=None):
+        """All periodic work on one thread, in phase order input -> spawn -> sim -> replicate"""
+        scheduler = MultiRateScheduler()
+        if input_step:
+            scheduler.add('input', input_step, self.input_rate)
+        scheduler.add('spawn', self._locked(self.spawn_step), self.spawn_rate)
+        scheduler.add('sim', self._locked(self.tick_step), self.tick_rate)
+        if replicate_step:
+            scheduler.add('replicate', replicate_step, self.replication_rate)
         
-        # Reset player
-        self.player = Player()
+        # Respawns counted down by tick_step start over on the scheduler's timers
+        if self._respawn:
+            self.respawn_timer = self._step_timers.remaining(self._respawn)
+            self._respawn.cancel()
+            self._respawn = None
+        for timer in self._player_respawns.values():
+            timer.cancel()
+        self._player_respawns.clear()
         
-        # Clear bullet
-        self.bullet = None
+        self.scheduler = scheduler
+        if self.game_over:
+            self._go_idle()
+        elif self.respawning:
+            self._start_respawn(self.respawn_timer or RESPAWN_SECONDS)  # Resumed mid-respawn
+        else:
+            for player in self.players:
+                if not player.active and player.lives > 0:
+                    self._player_respawns[player.player_id] = self._schedule_respawn(
+                        RESPAWN_SECONDS, partial(self._finish_player_respawn, player.player_id))
+        return scheduler
+    
+    def reset_game(self):
+        # Reset players
+        self.players = self._new_players(len(self.players))
+        
+        # Clear bullets
+        self.bullets = []
+        self.position_history.clear()
+        self._last_tick_start = None
         
         # Reset river
         self.river_y_offset = 0
@@ -548,37 +1045,220 @@ class GameServer:
         self.game_over = False
         self.respawning = False
         self.respawn_timer = 0
-        self.pending_input = {'dx': 0, 'shoot': False}
+        if self._respawn:
+            self._respawn.cancel()
+            self._respawn = None
+        for timer in self._player_respawns.values():
+            timer.cancel()
+        self._player_respawns.clear()
+        self.pending_inputs = [{'dx': 0, 'shoot': False} for _ in self.players]
+        
+        self.events.emit(Reset(self.tick))
+        if self.telemetry:
+            self.telemetry.note_restart()
+    
+    def capture_checkpoint(self):
+        """Caller must hold state_lock. Plain copies only - encoding happens on the writer thread"""
+        entities = lambda items: [dict(e.__dict__) for e in items]
+        return {
+            'world': {
+                'tick': self.tick,
+                'respawning': self.respawning,
+                'respawn_timer': (self.scheduler.timers if self.scheduler else self._step_timers).remaining(self._respawn)
+                                 if self._respawn else 0,
+                'river_scroll_speed': self.river_scroll_speed,
+                'river_y_offset': self.river_y_offset,
+                'bridge_counter': self.bridge_counter,
+                'last_checkpoint_bridge_id': self.last_checkpoint_bridge_id,
+                'game_over': self.game_over,
+            },
+            'players': entities(self.players),
+            'bullets': entities(self.bullets),
+            'helicopters': entities(self.helicopters),
+            'tankers': entities(self.tankers),
+            'jets': entities(self.jets),
+            'fuel_depots': entities(self.fuel_depots),
+            'bridges': entities(self.bridges),
+            'river': [(seg.y_start, seg.width, seg.center_x) for seg in self.river_segments],
+        }
+    
+    def restore_checkpoint(self, sections):
+        """Caller must hold state_lock"""
+        global _entity_ids
         
-        print("[Game] Reset complete.")
+        for key, value in sections['world'].items():
+            setattr(self, key, value)
+        
+        if 'players' in sections:
+            players = [Player(**p) for p in sections['players']]
+            self.bullets = [Bullet(**b) for b in sections['bullets']]
+        else:  # Single-player checkpoint
+            players = [Player(**sections['player'])]
+            self.bullets = [Bullet(**sections['bullet'])] if sections['bullet'] else []
+        # The checkpoint may have been taken with a different player count
+        count = len(self.players)
+        self.players = players[:count] + [Player(x=self._spawn_x(i, count), player_id=i)
+                                          for i in range(len(players), count)]
+        self.bullets = [b for b in self.bullets if b.owner < count]
+        self.helicopters = [Helicopter(**e) for e in sections['helicopters']]
+        self.tankers = [Tanker(**e) for e in sections['tankers']]
+        self.jets = [Jet(**e) for e in sections['jets']]
+        self.fuel_depots = [FuelDepot(**e) for e in sections['fuel_depots']]
+        self.bridges = [Bridge(**e) for e in sections['bridges']]
+        self.river_segments = [RiverSegment(*seg) for seg in sections['river']]
+        self.position_history.clear()
+        
+        # New entities must not reuse restored ids
+        restored = (self.players + self.bullets + self.helicopters + self.tankers + self.jets
+                    + self.fuel_depots + self.bridges)
+        _entity_ids = itertools.count(max(e.entity_id for e in restored) + 1)
+    
+    def _resume(self):
+        t0 = time.perf_counter()
+        checkpoint = load_checkpoint(self.checkpoint_path)
+        if checkpoint is None:
+            return
+        with self.state_lock:
+            self.restore_checkpoint(checkpoint['sections'])
+        if self.checkpoints:
+            self.checkpoints.seq = checkpoint['seq']
+        age = time.time() - checkpoint['time']
+        print(f"Resumed from checkpoint {checkpoint['seq']} ({age:.1f}s old) in {(time.perf_counter() - t0) * 1000:.1f} ms")
+    
+    def metrics(self):
+        return {
+            'timestamp': time.time(),
+            **self.replicator.metrics(),
+            **self.simulation_metrics(),
+        }
+    
+    def simulation_metrics(self):
+        return {
+            'ticks': {
+                'tick': self.tick,
+                'overruns': self.tick_overruns,
+                'inputs_skipped': self.inputs_skipped,
+            },
+            'lag_compensation': {
+                'max_rewind_ticks': self.max_rewind_ticks,
+                'bullet_rewind_ticks': max((b.rewind_ticks for b in self.bullets), default=None),
+                'rewound_hits': self.rewound_hits,
+            },
+            'players': {
+                'count': len(self.players),
+                'active': len(self._ships()),
+                'mode': self.mode,
+            },
+            'checkpoint': self.checkpoints.stats() if self.checkpoints else None,
+            'events': self.events.stats(),
+            'telemetry': self.telemetry.stats() if self.telemetry else None,
+            'profiler': self.profiler.stats(),
+            'scheduler': self.scheduler.stats() if self.scheduler else None,
+        }
+    
+    def _write_metrics(self):
+        write_metrics(self.metrics(), self.metrics_path)
+    
+    def _emit_status(self):
+        if self.game_over:
+            return
+        with self.state_lock:
+            status = Status(self.tick, sum(p.lives for p in self.players), sum(p.score for p in self.players),
+                            min(p.fuel for p in self.players), self.last_checkpoint_bridge_id + 1)
+        self.events.emit(status)
     
     def start(self):
         print("=== River Raid Server Starting ===")
         
-        threads = [
-            threading.Thread(target=self.thread_H_helicopter, daemon=True, name="Thread_H"),
-            threading.Thread(target=self.thread_J_jet, daemon=True, name="Thread_J"),
-            threading.Thread(target=self.thread_B_tanker, daemon=True, name="Thread_B"),
-            threading.Thread(target=self.game_tick, daemon=True, name="GameTick"),
-            threading.Thread(target=self.replicate_state, daemon=True, name="Replication"),
-            threading.Thread(target=self.handle_client_rpc, daemon=True, name="ClientRPC"),
-        ]
+        if self.checkpoint_path:
+            self._resume()
         
-        for t in threads:
-            t.start()
-            print(f"Started {t.name}")
+        scheduler_thread = self.build_scheduler(self.read_input, self.replicate_step).start()
         
-        print("\nServer running... Press Ctrl+C to stop\n")
+        self.replicator.start()
+        self.events.start()
+        if self.telemetry:
+            self.telemetry.start()
+        self.profiler.start()
+        self.profiler.install_signal()
+        
+        if self.checkpoints:
+            self.checkpoints.start()
+        
+        print(f"\nServer running (pid {os.getpid()})... Press Ctrl+C to stop\n")
         
         try:
             while True:
                 time.sleep(2)
-                if not self.game_over:
-                    with self.state_lock:
-                     print(f"Lives: {self.player.lives} | Score: {self.player.score} | Fuel: {self.player.fuel:.1f} | Bridge: {self.last_checkpoint_bridge_id + 1}")
+                self._write_metrics()
+                self._emit_status()
         except KeyboardInterrupt:
             print("\n\nServer shutting down...")
+            self.scheduler.stop()  # No tick may run while the final checkpoint and telemetry are written
+            scheduler_thread.join()
+            self.replicator.close()
+            if self.checkpoints:
+                self.checkpoints.write()
+            if self.telemetry:
+                self.telemetry.close()
+            self.events.stop()
 
 if __name__ == '__main__':
-    server = GameServer()
-    server.start()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="River Raid game server")
+    parser.add_argument('--spectator-host', default=SPECTATOR_HOST,
+                        help="Interface for spectator connections (default: localhost only)")
+    parser.add_argument('--spectator-port', type=int, default=SPECTATOR_PORT,
+                        help="TCP port for spectators, 0 disables spectating")
+    parser.add_argument('--snapshot-dict', default=DICTIONARY_PATH,
+                        help="Trained compression dictionary (built-in one if the file is missing)")
+    parser.add_argument('--compress-level', type=int, default=6, help="zlib level 1-9")
+    parser.add_argument('--record-snapshots', metavar='PATH',
+                        help="Append replicated snapshots to a JSON-lines file")
+    parser.add_argument('--max-rewind-ms', type=int, default=200,
+                        help="Lag compensation: how far back a shot may be checked, 0 disables")
+    parser.add_argument('--checkpoint', default=CHECKPOINT_PATH,
+                        help="World checkpoint file, resumed from on startup ('' disables)")
+    parser.add_argument('--checkpoint-interval', type=float, default=1.0,
+                        help="Seconds between checkpoints, 0 disables writing")
+    parser.add_argument('--split-process', action='store_true',
+                        help="Run the simulation and the client I/O in separate processes")
+    parser.add_argument('--state-path', default=GAME_STATE_PATH, help="Snapshot file read by the client")
+    parser.add_argument('--input-path', default=PLAYER_INPUT_PATH, help="Input file written by the client")
+    parser.add_argument('--metrics-path', default=METRICS_PATH)
+    parser.add_argument('--event-log', default=EVENT_LOG_PATH,
+                        help="JSON-lines file of deaths, spawns, checkpoints... ('' for console only)")
+    parser.add_argument('--telemetry', metavar='DIR',
+                        help="Record per-tick fuel, speed, score, entity counts and deaths to DIR")
+    parser.add_argument('--profile-dir', default=PROFILE_DIR,
+                        help=f"Where the profiler (kill -USR1 or touch {PROFILE_CONTROL_PATH}) writes collapsed stacks")
+    parser.add_argument('--profile-rate', type=int, default=100, help="Profiler samples per second")
+    parser.add_argument('--tick-rate', type=float, default=TICK_RATE, help="Simulation ticks per second (game speed)")
+    parser.add_argument('--spawn-rate', type=float, default=TICK_RATE, help="Enemy spawn rolls per second")
+    parser.add_argument('--input-rate', type=float, default=TICK_RATE, help="Input file polls per second")
+    parser.add_argument('--replication-rate', type=float, default=TICK_RATE,
+                        help="Replication checks per second (the per-client rate adapts below this)")
+    parser.add_argument('--players', type=int, default=1,
+                        help="Players sharing the world; player N>0 uses <name>_N files (see player_path)")
+    parser.add_argument('--mode', choices=GAME_MODES, default='coop',
+                        help="coop: game over when everyone is out of lives, versus: when one player is left")
+    args = parser.parse_args()
+    if args.split_process and args.players > 1:
+        parser.error("--split-process only supports one player")
+    
+    replication_args = dict(spectator_host=args.spectator_host, spectator_port=args.spectator_port,
+                            snapshot_dict=args.snapshot_dict, compress_level=args.compress_level,
+                            record_snapshots=args.record_snapshots, state_path=args.state_path)
+    simulation_args = dict(max_rewind_ms=args.max_rewind_ms, checkpoint_path=args.checkpoint,
+                           checkpoint_interval=args.checkpoint_interval, event_log_path=args.event_log,
+                           telemetry_dir=args.telemetry, tick_rate=args.tick_rate, spawn_rate=args.spawn_rate,
+                           players=args.players, mode=args.mode)
+    io_args = dict(input_path=args.input_path, metrics_path=args.metrics_path, profile_dir=args.profile_dir,
+                   profile_rate=args.profile_rate, input_rate=args.input_rate,
+                   replication_rate=args.replication_rate)
+    
+    if args.split_process:
+        from split_process import run_split
+        run_split(simulation_args, replication_args, io_args)
+    else:
+        server = GameServer(**replication_args, **simulation_args, **io_args)
+        server.start()
@@ -0,0 +1,462 @@
+"""Snapshot protocol shared by the server and the clients.
+
+Every snapshot written for a client carries a 'seq'. Clients report the last
+seq they decoded ('ack'), their measured round-trip time ('rtt_ms') and the
+features they accept ('accept') in each input message. The server keeps one
+ClientChannel per client and picks the snapshot rate and detail level from
+that feedback.
+
+Frames are either a full snapshot:
+    {"seq": 12, "player": {...}, ...}
+or a delta against a snapshot the client has acked:
+    {"seq": 12, "base": 9, "delta": {...}}
+
+If the client accepts it, the JSON is deflated (optionally with a preset
+dictionary) and sent as b'Z' + dict id (u32) + length (u32) + data. Plain
+JSON frames start with '{', so both kinds can share a file or socket.
+"""
+import json
+import os
+import re
+import struct
+import time
+import zlib
+from collections import Counter
+
+# Detail levels: (decimals kept on floats, delta updates allowed)
+DETAIL_LEVELS = [
+    (None, False),  # 0: full precision, full snapshots
+    (2, False),     # 1: centi-pixel positions
+    (1, True),      # 2: deltas, tenth-pixel positions
+    (0, True),      # 3: deltas, whole-pixel positions
+]
+
+MIN_INTERVAL = 1 / 60   # Fastest snapshot rate (one per game tick)
+MAX_INTERVAL = 1 / 10   # Slowest rate on a bad link
+HISTORY_SIZE = 64       # Snapshots kept on both sides as delta baselines
+EXACT_KEYS = {'timestamp', 'input_ts'}  # Never quantized
+
+COMPRESSED_MAGIC = b'Z'
+COMPRESSED_HEADER = struct.Struct('>II')  # dict id (0 = none), payload length
+DICTIONARY_PATH = 'snapshot_dict.bin'
+
+# Representative snapshot used to build the built-in dictionary
+SAMPLE_SNAPSHOT = {
+    'respawning': False,
+    'player': {'x': 400.0, 'y': 520, 'fuel': 87.52, 'lives': 3, 'score': 1260},
+    'bullet': {'x': 400.0, 'y': 312.5},
+    'helicopters': [{'x': 315.5, 'y': 142.0}, {'x': 452.0, 'y': -212.0}],
+    'tankers': [{'x': 380.0, 'y': 60.0}],
+    'jets': [{'x': 612.0, 'y': 224.0}],
+    'fuel_depots': [{'x': 400, 'y': -212.0}, {'x': 350, 'y': 188.0}],
+    'bridges': [{'x': 400, 'y': 42.0, 'destroyed': False, 'id': 2}],
+    'river_spans': [{'y': -1248, 'left': 237.5, 'right': 562.5}, {'y': -1200, 'left': 237.5, 'right': 562.5}],
+    'game_over': False,
+    'scroll_speed': 2.0,
+    'input_ts': 1700000000.123456,
+    'timestamp': 1700000000.123456,
+    'seq': 1234,
+}
+
+
+def quantize(value, decimals):
+    if decimals is None:
+        return value
+    if isinstance(value, float):
+        return round(value) if decimals == 0 else round(value, decimals)
+    if isinstance(value, dict):
+        return {k: v if k in EXACT_KEYS else quantize(v, decimals) for k, v in value.items()}
+    if isinstance(value, list):
+        return [quantize(v, decimals) for v in value]
+    return value
+
+
+def make_delta(base: dict, state: dict) -> dict:
+    """Keys of state that changed since base.
+
+    Snapshot dicts have a fixed set of keys, so nested dicts are diffed
+    recursively. Lists of the same length are diffed item by item and sent as
+    {"items": [...]}; anything else is replaced.
+    """
+    delta = {}
+    for key, value in state.items():
+        old = base.get(key)
+        if key in base and old == value:
+            continue
+        if isinstance(value, dict) and isinstance(old, dict):
+            value = make_delta(old, value)
+        elif isinstance(value, list) and isinstance(old, list) and len(value) == len(old) \
+                and all(isinstance(v, dict) and isinstance(o, dict) for v, o in zip(value, old)):
+            value = {'items': [make_delta(o, v) for o, v in zip(old, value)]}
+        delta[key] = value
+    return delta
+
+
+def apply_delta(base: dict, delta: dict) -> dict:
+    state = dict(base)
+    for key, value in delta.items():
+        old = base.get(key)
+        if isinstance(value, dict) and isinstance(old, dict):
+            value = apply_delta(old, value)
+        elif isinstance(value, dict) and isinstance(old, list):
+            value = [apply_delta(o, d) for o, d in zip(old, value['items'])]
+        state[key] = value
+    return state
+
+
+def train_dictionary(samples: list[bytes], size=8192) -> bytes:
+    """Build a zlib preset dictionary from recorded snapshot payloads.
+
+    Numbers are stripped out and the remaining key/punctuation fragments are
+    ranked by how many bytes they would save. zlib references the end of the
+    dictionary most cheaply, so the best fragments go last.
+    """
+    fragments = Counter()
+    for sample in samples:
+        for fragment in re.split(rb'-?\d+(?:\.\d+)?(?:e-?\d+)?', sample):
+            if len(fragment) > 2:
+                fragments[fragment] += 1
+
+    ranked = sorted(fragments, key=lambda f: fragments[f] * len(f), reverse=True)
+    chosen = []
+    total = 0
+    for fragment in ranked:
+        if total + len(fragment) > size:
+            break
+        chosen.append(fragment)
+        total += len(fragment)
+    return b''.join(reversed(chosen))
+
+
+SAMPLE_DELTA = {'seq': 1235, 'base': 1234, 'delta': {
+    'player': {'x': 402.0, 'fuel': 87.46},
+    'helicopters': {'items': [{'y': 144.0}, {'x': 453.5, 'y': -210.0}]},
+    'timestamp': 1700000000.123456,
+}}
+
+DEFAULT_DICTIONARY = train_dictionary([json.dumps(SAMPLE_SNAPSHOT).encode(),
+                                       json.dumps(SAMPLE_DELTA).encode()])
+
+
+def load_dictionary(path=DICTIONARY_PATH) -> bytes:
+    """Trained dictionary from path, or the built-in one if there is none."""
+    if path and os.path.exists(path):
+        with open(path, 'rb') as f:
+            return f.read()
+    return DEFAULT_DICTIONARY
+
+
+class Compressor:
+    """Deflates encoded snapshots; shared by every channel on the server."""
+
+    def __init__(self, dictionary: bytes | None = None, level=6):
+        self.dictionary = dictionary if dictionary is not None else DEFAULT_DICTIONARY
+        self.dict_id = zlib.crc32(self.dictionary)
+        self.dict_codec = f'zdict:{self.dict_id:08x}'
+        self.level = level
+
+    def choose(self, accept) -> str | None:
+        """Best codec both sides support (None = plain JSON)."""
+        if self.dict_codec in accept:
+            return self.dict_codec
+        if 'zlib' in accept:
+            return 'zlib'
+        return None
+
+    def compress(self, payload: bytes, codec: str | None) -> bytes:
+        if codec is None:
+            return payload
+        if codec == self.dict_codec:
+            comp = zlib.compressobj(self.level, zdict=self.dictionary)
+            dict_id = self.dict_id
+        else:
+            comp = zlib.compressobj(self.level)
+            dict_id = 0
+        data = comp.compress(payload) + comp.flush()
+        return COMPRESSED_MAGIC + COMPRESSED_HEADER.pack(dict_id, len(data)) + data
+
+
+def decompress(data: bytes, dictionary: bytes | None = None) -> bytes:
+    """Plain JSON bytes for any frame produced by Compressor.compress."""
+    if data[:1] != COMPRESSED_MAGIC:
+        return data
+    dict_id, length = COMPRESSED_HEADER.unpack_from(data, 1)
+    body = data[1 + COMPRESSED_HEADER.size:1 + COMPRESSED_HEADER.size + length]
+    if dict_id == 0:
+        return zlib.decompress(body)
+    if dictionary is None or zlib.crc32(dictionary) != dict_id:
+        raise ValueError(f"Snapshot uses unknown dictionary {dict_id:08x}")
+    decomp = zlib.decompressobj(zdict=dictionary)
+    return decomp.decompress(body) + decomp.flush()
+
+
+def read_frame(f) -> bytes:
+    """Read one frame (plain or compressed) from a binary stream."""
+    first = f.read(1)
+    if not first:
+        return b''
+    if first != COMPRESSED_MAGIC:
+        return first + f.readline()
+    header = f.read(COMPRESSED_HEADER.size)
+    _, length = COMPRESSED_HEADER.unpack(header)
+    return first + header + f.read(length)
+
+
+def next_deadline(deadline, interval, now):
+    """Send time after the one at `deadline`. Counted from the deadline, not from
+    now: sends happen on the caller's grid (the replicate phase), and restarting
+    the interval from each grid point loses up to a grid step per send. After a
+    stall of more than an interval it restarts from now instead of bursting."""
+    return max(deadline + interval, now)
+
+
+class ReplicationController:
+    """Picks snapshot interval and detail level for one client.
+
+    Latency is the worse of the client's reported RTT and the age of the
+    newest snapshot it has acked. Above high_ms the rate is cut and detail
+    lowered; below low_ms the rate creeps back up to one snapshot per tick.
+    """
+
+    def __init__(self, interval=0.033, high_ms=150, low_ms=80, adjust_every=0.5):
+        self.interval = interval
+        self.level = 0
+        self.high_ms = high_ms
+        self.low_ms = low_ms
+        self.adjust_every = adjust_every
+        self.last_adjust = 0.0
+
+    def update(self, latency_ms, now):
+        if latency_ms is None or now - self.last_adjust < self.adjust_every:
+            return
+        self.last_adjust = now
+
+        if latency_ms > self.high_ms:
+            self.interval = min(MAX_INTERVAL, self.interval * 1.5)
+            self.level = min(len(DETAIL_LEVELS) - 1, self.level + 1)
+        elif latency_ms < self.low_ms:
+            self.interval = max(MIN_INTERVAL, self.interval - 0.004)
+            self.level = max(0, self.level - 1)
+
+
+class ClientChannel:
+    """Server side of one client's snapshot stream."""
+
+    def __init__(self, client_id, controller: ReplicationController | None = None,
+                 compressor: Compressor | None = None):
+        self.client_id = client_id
+        self.controller = controller or ReplicationController()
+        self.compressor = compressor
+        self.codec = None
+        self.seq = 0
+        self.history: dict[int, tuple[float | None, dict]] = {}  # seq -> (sent time, quantized state)
+        self.adapting = True
+        self.next_send = 0.0
+
+        self.accept: set[str] = set()
+        self.ack = None
+        self.rtt_ms = None
+        self.ack_delay_ms = None
+        self.last_size = 0
+        self.full_sent = 0
+        self.delta_sent = 0
+
+    def on_feedback(self, message: dict, now: float, adapt=True):
+        """Take ack/rtt/accept from the client's latest input message. adapt=False
+        (the world is idle and snapshots are a slow heartbeat) keeps the rate and
+        detail where they are."""
+        if not message:
+            return
+        self.accept = set(message.get('accept', ()))
+        if self.compressor:
+            self.codec = self.compressor.choose(self.accept)
+        self.rtt_ms = message.get('rtt_ms')
+
+        # Ack delay is only measured when the ack moves; an old ack re-sent with
+        # every input would otherwise age with the time since its snapshot went out.
+        # Heartbeats sent while idle have no sent time: their acks are only looked
+        # at once a second, which says nothing about the link.
+        ack = message.get('ack')
+        if ack in self.history and ack != self.ack:
+            self.ack = ack
+            sent = self.history[ack][0]
+            if sent is not None and adapt:
+                self.ack_delay_ms = (now - sent) * 1000
+
+        self.adapting = adapt
+        if adapt:
+            latencies = [v for v in (self.rtt_ms, self.ack_delay_ms) if v is not None]
+            self.controller.update(max(latencies) if latencies else None, now)
+
+    def due(self, now) -> bool:
+        return now >= self.next_send
+
+    def encode(self, state: dict, now: float) -> bytes:
+        decimals, use_delta = DETAIL_LEVELS[self.controller.level]
+        state = quantize(state, decimals)
+
+        self.seq += 1
+        base = self.history.get(self.ack) if use_delta and 'delta' in self.accept else None
+        if base is not None and base[1].keys() == state.keys():
+            frame = {'seq': self.seq, 'base': self.ack, 'delta': make_delta(base[1], state)}
+            self.delta_sent += 1
+        else:
+            frame = dict(state, seq=self.seq)
+            self.full_sent += 1
+
+        self.history[self.seq] = (now if self.adapting else None, state)
+        if len(self.history) > HISTORY_SIZE:
+            del self.history[next(iter(self.history))]
+
+        self.next_send = next_deadline(self.next_send, self.controller.interval, now)
+        payload = (json.dumps(frame) + '\n').encode()
+        if self.codec:
+            payload = self.compressor.compress(payload, self.codec)
+        self.last_size = len(payload)
+        return payload
+
+    def stats(self) -> dict:
+        decimals, use_delta = DETAIL_LEVELS[self.controller.level]
+        return {
+            'rate_hz': round(1 / self.controller.interval, 1),
+            'rtt_ms': self.rtt_ms,
+            'ack_delay_ms': round(self.ack_delay_ms, 1) if self.ack_delay_ms is not None else None,
+            'detail_level': self.controller.level,
+            'precision': decimals,
+            'delta': use_delta and 'delta' in self.accept,
+            'codec': self.codec,
+            'snapshot_bytes': self.last_size,
+            'full_sent': self.full_sent,
+            'delta_sent': self.delta_sent,
+        }
+
+
+class SnapshotReceiver:
+    """Client side: rebuilds full states from frames and produces feedback."""
+
+    def __init__(self, dictionary: bytes | None = None):
+        self.dictionary = dictionary if dictionary is not None else DEFAULT_DICTIONARY
+        self.accept = ['delta', f'zdict:{zlib.crc32(self.dictionary):08x}', 'zlib']
+        self.snapshots: dict[int, dict] = {}
+        self.last_seq = None
+        self.rtt_ms = None
+        self.last_input_ts = None
+        self.view_tick = None
+
+    def decode(self, data: bytes):
+        """Decompress and parse a frame read from the server, then receive() it."""
+        return self.receive(json.loads(decompress(data, self.dictionary)))
+
+    def receive(self, frame: dict):
+        """Returns the full state, or None if the delta's baseline is unknown."""
+        if 'delta' in frame:
+            base = self.snapshots.get(frame['base'])
+            if base is None:
+                return None
+            state = apply_delta(base, frame['delta'])
+            state['seq'] = frame['seq']
+        else:
+            state = frame
+
+        seq = frame.get('seq')
+        if seq is not None and seq != self.last_seq:
+            # Re-insert so a restarted server's seqs replace stale baselines
+            self.snapshots.pop(seq, None)
+            self.snapshots[seq] = state
+            if len(self.snapshots) > HISTORY_SIZE:
+                del self.snapshots[next(iter(self.snapshots))]
+            self.last_seq = seq
+
+        # Tick of the newest state we have, i.e. what the player is looking at
+        self.view_tick = state.get('tick', self.view_tick)
+
+        # Server echoes the timestamp of the last input it applied
+        input_ts = state.get('input_ts')
+        if input_ts and input_ts != self.last_input_ts:
+            self.last_input_ts = input_ts
+            rtt = (time.time() - input_ts) * 1000
+            self.rtt_ms = rtt if self.rtt_ms is None else self.rtt_ms * 0.9 + rtt * 0.1
+        return state
+
+    def feedback(self) -> dict:
+        return {
+            'ack': self.last_seq,
+            'rtt_ms': round(self.rtt_ms, 1) if self.rtt_ms is not None else None,
+            'accept': self.accept,
+            'view_tick': self.view_tick,
+        }
+
+
+def player_path(path: str, player: int) -> str:
+    """Per-player input/state file in a multiplayer world: player 0 keeps the
+    plain path (so single-player clients need no changes), player 2 of
+    /tmp/game_state.json uses /tmp/game_state_2.json."""
+    if not player:
+        return path
+    base, ext = os.path.splitext(path)
+    return f"{base}_{player}{ext}"
+
+
+class GameConnection:
+    """Client side of the file protocol, without pygame: write inputs, read snapshots.
+
+    opener is the built-in open() for a local server or an SFTP client's
+    open() for a remote one.
+    """
+
+    def __init__(self, input_path, state_path, opener=open, dictionary: bytes | None = None):
+        self.input_path = input_path
+        self.state_path = state_path
+        self.opener = opener
+        self.receiver = SnapshotReceiver(load_dictionary() if dictionary is None else dictionary)
+        self.input_seq = 0
+        self.last_good_state = None
+        self.last_data = None
+        
+        # About the last fetch_game_state() call, for frame timing
+        self.read_ms = 0.0
+        self.decode_ms = 0.0
+        self.new_state = False
+        self.read_started = None  # time.time() the read began
+
+    def send_input(self, dx, speed, shoot, restart=False) -> int:
+        """Write one input and return its seq. Raises on I/O errors."""
+        self.input_seq += 1
+        data = {
+            'seq': self.input_seq,
+            'dx': dx,
+            'speed': speed,
+            'shoot': shoot,
+            'restart': restart,
+            'timestamp': time.time()
+        }
+        # Ack / RTT / accepted features drive the server's replication rate,
+        # view_tick lets the server check our shots against what we saw
+        data.update(self.receiver.feedback())
+
+        with self.opener(self.input_path, 'w') as f:
+            f.write(json.dumps(data))
+        return self.input_seq
+
+    def fetch_game_state(self):
+        """Newest state, or the last good one if the read fails, is torn or
+        has not changed (an unchanged file is not decoded again)."""
+        self.new_state = False
+        self.decode_ms = 0.0
+        self.read_started = time.time()
+        t0 = time.perf_counter()
+        try:
+            with self.opener(self.state_path, 'rb') as f:
+                data = f.read()
+            t1 = time.perf_counter()
+            self.read_ms = (t1 - t0) * 1000
+            if data and data != self.last_data:
+                state = self.receiver.decode(data)
+                self.decode_ms = (time.perf_counter() - t1) * 1000
+                if state is not None:
+                    self.last_good_state = state
+                    self.last_data = data
+                    self.new_state = True
+        except Exception:
+            self.read_ms = (time.perf_counter() - t0) * 1000
+        return self.last_good_state
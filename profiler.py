@@ -0,0 +1,125 @@
+"""On-demand sampling profiler for the server's threads.
+
+Off by default. Switch it on (and off again) while the server runs with
+
+    kill -USR1 <server pid>          # toggles
+    touch /tmp/server_profile        # on while the file exists
+    rm /tmp/server_profile
+
+While on, a "Profiler" thread samples sys._current_frames() `rate` times a
+second and counts each named thread's stack. When it stops it writes the
+counts as collapsed stacks (one `Thread;outer;...;inner count` line per
+stack), ready for flamegraph.pl, speedscope or inferno:
+
+    flamegraph.pl /tmp/profile-1234-1700000000.folded > profile.svg
+
+While off, the thread only wakes once a second to check the control file.
+"""
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+
+
+class SamplingProfiler:
+    def __init__(self, output_dir: str, control_path: str | None = None, rate=100, max_seconds=60,
+                 threads=None):
+        self.output_dir = output_dir
+        self.control_path = control_path
+        self.interval = 1 / rate
+        self.max_seconds = max_seconds  # Stop on its own in case nobody turns it off
+        self.threads = threads          # Thread names to sample, None for all but our own
+
+        self.enabled = threading.Event()
+        self.control_exists = False
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.last_output = None
+
+    def install_signal(self):
+        """SIGUSR1 toggles sampling. Must be called from the main thread."""
+        if hasattr(signal, 'SIGUSR1'):
+            signal.signal(signal.SIGUSR1, lambda signum, frame: self.toggle())
+
+    def toggle(self):
+        if self.enabled.is_set():
+            self.enabled.clear()
+        else:
+            self.enabled.set()
+
+    def start(self):
+        thread = threading.Thread(target=self.run, daemon=True, name="Profiler")
+        thread.start()
+        return thread
+
+    def run(self):
+        while True:
+            if self.enabled.wait(timeout=1.0):
+                self._profile()
+            elif self._control_changed() and self.control_exists:
+                self.enabled.set()
+
+    def _control_changed(self) -> bool:
+        """Whether the control file appeared or disappeared since the last check."""
+        exists = bool(self.control_path) and os.path.exists(self.control_path)
+        changed, self.control_exists = exists != self.control_exists, exists
+        return changed
+
+    def _profile(self):
+        print(f"[Profiler] Sampling at {1 / self.interval:.0f} Hz")
+        self.stacks = Counter()
+        self.samples = 0
+        me = threading.get_ident()
+        end = time.perf_counter() + self.max_seconds
+        next_sample = time.perf_counter()
+        next_check = next_sample + 1.0
+
+        while self.enabled.is_set() and next_sample < end:
+            if next_sample >= next_check:
+                next_check += 1.0
+                if self._control_changed() and not self.control_exists:
+                    break
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                name = names.get(ident)
+                if ident == me or name is None or (self.threads and name not in self.threads):
+                    continue
+                self.stacks[self._collapse(name, frame)] += 1
+            self.samples += 1
+
+            next_sample += self.interval
+            time.sleep(max(0, next_sample - time.perf_counter()))
+
+        self.enabled.clear()
+        self._write()
+
+    @staticmethod
+    def _collapse(thread_name, frame) -> str:
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        stack.append(thread_name)
+        return ';'.join(reversed(stack))
+
+    def _write(self):
+        path = os.path.join(self.output_dir, f'profile-{os.getpid()}-{int(time.time())}.folded')
+        try:
+            with open(path, 'w') as f:
+                for stack, count in self.stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+        except OSError as e:
+            print(f"[Profiler] Write failed: {e}")
+            return
+        self.last_output = path
+        print(f"[Profiler] {self.samples} samples written to {path}")
+
+    def stats(self) -> dict:
+        return {
+            'running': self.enabled.is_set(),
+            'samples': self.samples,
+            'last_output': self.last_output,
+        }
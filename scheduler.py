@@ -0,0 +1,155 @@
+"""Single-threaded, multi-rate loop for the server's periodic work.
+
+Each phase has its own rate, but all of them are scheduled on one clock
+from the same start time, so phases whose rates divide evenly fall due in
+the same cycle. Within a cycle, due phases always run in the order they
+were added. The server adds input -> spawn -> sim -> replicate, so a tick
+always sees the newest input and a snapshot never catches the world
+halfway through a tick.
+
+Phases can be paused or slowed down while nothing is happening (respawn,
+game over), and one-shot timers go on a timer wheel, so an idle loop only
+wakes for what is actually due. Anything that changes the schedule from
+another thread should call wake().
+
+run() is the scheduler's own loop. A SessionHost drives many schedulers from
+one thread instead, through begin(), run_due() and next_wakeup().
+"""
+import math
+import threading
+import time
+
+from timer_wheel import TimerWheel
+
+
+class Phase:
+    def __init__(self, name, fn, rate):
+        self.name = name
+        self.fn = fn
+        self.interval = 1 / rate
+        self.next_due = 0.0
+        self.paused = False
+        self.rescheduled = False  # next_due was set by pause/resume/set_rate
+        self.runs = 0
+        self.skipped = 0       # Cycles missed because the loop was running late
+        self.total_s = 0.0
+        self.max_s = 0.0
+        self.late_max_s = 0.0  # Longest a run started after it was due
+
+
+class MultiRateScheduler:
+    def __init__(self, name="Scheduler"):
+        self.name = name
+        self.phases: dict[str, Phase] = {}
+        self.timers = TimerWheel()
+        self.start_time = self.timers.start
+        self.wakeup = threading.Event()
+        self.running = False
+        self.wakeups = 0
+
+    def add(self, name, fn, rate):
+        self.phases[name] = Phase(name, fn, rate)
+
+    def pause(self, *names):
+        for name in names:
+            if name in self.phases:
+                self.phases[name].paused = True
+
+    def resume(self, *names):
+        now = time.perf_counter()
+        for name in names:
+            phase = self.phases.get(name)
+            if phase and phase.paused:
+                phase.paused = False
+                phase.next_due = self._next_slot(phase, now)
+                phase.rescheduled = True
+        self.wakeup.set()
+
+    def set_rate(self, name, rate):
+        phase = self.phases.get(name)
+        if phase and phase.interval != 1 / rate:
+            phase.interval = 1 / rate
+            phase.next_due = self._next_slot(phase, time.perf_counter())
+            phase.rescheduled = True
+            self.wakeup.set()
+
+    def wake(self):
+        self.wakeup.set()
+
+    def _next_slot(self, phase, now):
+        """First point on the phase's grid (counted from the start time) at or after now."""
+        return self.start_time + math.ceil((now - self.start_time) / phase.interval) * phase.interval
+
+    def start(self):
+        thread = threading.Thread(target=self.run, daemon=True, name=self.name)
+        thread.start()
+        return thread
+
+    def run(self):
+        print(f"[{self.name}] " + " -> ".join(f"{p.name} {1 / p.interval:g} Hz" for p in self.phases.values()))
+        self.begin()
+        while self.running:
+            self.run_due(time.perf_counter())
+            due = self.next_wakeup()
+            self.wakeup.wait(None if due is None else max(0, due - time.perf_counter()))  # None: until woken
+            self.wakeup.clear()
+            self.wakeups += 1
+
+    def begin(self, start=None):
+        """Put every phase on a grid starting at `start` (default now)."""
+        self.start_time = time.perf_counter() if start is None else start
+        for phase in self.phases.values():
+            phase.next_due = self.start_time
+        self.running = True
+
+    def run_due(self, now):
+        """Fire due timers, then run every due, unpaused phase in order."""
+        self.timers.advance(now)
+        for phase in list(self.phases.values()):
+            if phase.paused or now < phase.next_due:
+                continue
+            phase.rescheduled = False
+            t0 = time.perf_counter()
+            phase.late_max_s = max(phase.late_max_s, t0 - phase.next_due)
+            phase.fn()
+            elapsed = time.perf_counter() - t0
+            phase.runs += 1
+            phase.total_s += elapsed
+            phase.max_s = max(phase.max_s, elapsed)
+
+            if phase.rescheduled or phase.paused:
+                continue  # Its own step changed its schedule
+            # Next slot on this phase's grid, skipping any we are already past
+            missed = math.floor((now - phase.next_due) / phase.interval)
+            phase.skipped += missed
+            phase.next_due += (missed + 1) * phase.interval
+
+    def next_wakeup(self) -> float | None:
+        """Clock time the next phase or timer is due, None if everything is paused."""
+        due = [p.next_due for p in self.phases.values() if not p.paused]
+        timer_due = self.timers.next_deadline()
+        if timer_due is not None:
+            due.append(timer_due)
+        return min(due) if due else None
+
+    def stop(self):
+        self.running = False
+        self.wakeup.set()
+
+    def stats(self) -> dict:
+        return {
+            'wakeups': self.wakeups,
+            'timers_pending': self.timers.pending,
+            'phases': {
+                p.name: {
+                    'rate': round(1 / p.interval, 2),
+                    'paused': p.paused,
+                    'runs': p.runs,
+                    'skipped': p.skipped,
+                    'mean_ms': round(p.total_s / p.runs * 1000, 3) if p.runs else 0,
+                    'max_ms': round(p.max_s * 1000, 3),
+                    'late_max_ms': round(p.late_max_s * 1000, 3),
+                }
+                for p in self.phases.values()
+            },
+        }
@@ -0,0 +1,438 @@
+"""Benchmarks for the River Raid server.
+
+Usage:
+    python server_bench.py spectators [--clients 300] [--slow 30] [--seconds 10]
+    python server_bench.py compression [--samples recorded.jsonl] [--train-dict snapshot_dict.bin]
+    python server_bench.py checkpoint [--writes 200]
+    python server_bench.py telemetry [--seconds 30]
+    python server_bench.py idle [--sessions 200] [--seconds 10]
+    python server_bench.py sessions [--max-miss 1.0] [--threads]
+    python server_bench.py players [--counts 1 2 4 8 16 32 64] [--mode coop]
+"""
+import argparse
+import json
+import os
+import random
+import selectors
+import socket
+import tempfile
+import threading
+import time
+
+from checkpoints import CheckpointWriter, load_checkpoint
+
+from collision import bullets_vs_targets, ships_vs_world
+from game_server import Bullet, GAME_MODES, GameServer, percentile
+from session_host import SessionHost, session_paths
+from net_protocol import (Compressor, DEFAULT_DICTIONARY, decompress, make_delta, quantize,
+                          train_dictionary)
+from spectators import SpectatorHub
+from telemetry import load_session
+
+
+def sample_snapshot():
+    server = GameServer(spectator_port=0, checkpoint_path=None)
+    with server.state_lock:
+        return server.build_snapshot()
+
+
+def run_headless(server):
+    """Run the game loop without files, sockets or replication; input comes from
+    whatever the caller leaves in server.pending_input."""
+    server.pending_input = {'dx': 0, 'shoot': True, 'restart': True}
+    server.build_scheduler(lambda: server.apply_input(server.pending_input)).start()
+    return server
+
+
+def record_snapshots(seconds, rate=30):
+    """Run a headless game that keeps shooting and restarting, sampling snapshots."""
+    server = run_headless(GameServer(spectator_port=0, checkpoint_path=None))
+
+    samples = []
+    end = time.time() + seconds
+    while time.time() < end:
+        server.pending_input = {'dx': random.choice([-5, 0, 5]), 'shoot': True, 'restart': True}
+        with server.state_lock:
+            samples.append(server.build_snapshot())
+        time.sleep(1 / rate)
+    return samples
+
+
+def bench_spectators(args):
+    hub = SpectatorHub(port=0, max_spectators=args.clients + args.slow)
+    hub.start()
+
+    # Fast spectators are drained by one selector thread
+    received = {}
+    sel = selectors.DefaultSelector()
+    for _ in range(args.clients):
+        sock = socket.create_connection((hub.host, hub.port))
+        sock.setblocking(False)
+        sel.register(sock, selectors.EVENT_READ)
+        received[sock] = 0
+
+    # Slow spectators connect with a tiny receive buffer and never read
+    slow = []
+    for _ in range(args.slow):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        sock.connect((hub.host, hub.port))
+        slow.append(sock)
+
+    running = True
+    bytes_in = [0]
+
+    def drain():
+        while running:
+            for key, _ in sel.select(timeout=0.1):
+                try:
+                    data = key.fileobj.recv(65536)
+                except BlockingIOError:
+                    continue
+                bytes_in[0] += len(data)
+                received[key.fileobj] += data.count(b'\n')
+
+    reader = threading.Thread(target=drain, daemon=True)
+    reader.start()
+
+    while hub.stats()['connected'] < args.clients + args.slow:
+        time.sleep(0.01)
+
+    state = sample_snapshot()
+    encode_times = []
+    broadcast_times = []
+    interval = 1 / args.rate
+    frames = 0
+    end = time.perf_counter() + args.seconds
+    next_frame = time.perf_counter()
+
+    while time.perf_counter() < end:
+        state['timestamp'] = time.time()
+        t0 = time.perf_counter()
+        payload = (json.dumps(state) + '\n').encode()
+        t1 = time.perf_counter()
+        hub.broadcast(payload)
+        t2 = time.perf_counter()
+        encode_times.append((t1 - t0) * 1000)
+        broadcast_times.append((t2 - t1) * 1000)
+        frames += 1
+
+        next_frame += interval
+        time.sleep(max(0, next_frame - time.perf_counter()))
+
+    time.sleep(0.2)
+    running = False
+    reader.join()
+    stats = hub.stats()
+    hub.close()
+
+    per_client = list(received.values())
+    mean_encode = sum(encode_times) / len(encode_times)
+    print(f"Spectators: {args.clients} fast + {args.slow} slow, {frames} frames at {args.rate} Hz")
+    print(f"Snapshot size:          {len(payload)} bytes")
+    print(f"Encode (once/frame):    mean {mean_encode:.3f} ms")
+    print(f"Encode per spectator:   would be {mean_encode * (args.clients + args.slow):.1f} ms/frame")
+    print(f"Broadcast:              mean {sum(broadcast_times) / frames:.3f} ms, "
+          f"p99 {percentile(broadcast_times, 99):.3f} ms, max {max(broadcast_times):.3f} ms")
+    print(f"Delivered per fast:     min {min(per_client)}, max {max(per_client)} of {frames} frames")
+    print(f"Throughput:             {bytes_in[0] / args.seconds / 1e6:.1f} MB/s")
+    print(f"Slow consumers:         {stats['dropped']} dropped, {stats['degraded']} degraded")
+
+
+def bench_compression(args):
+    if args.samples:
+        with open(args.samples) as f:
+            states = [json.loads(line) for line in f if line.strip()]
+    else:
+        print(f"Recording {args.seconds:.0f}s of gameplay...")
+        states = record_snapshots(args.seconds)
+
+    encode = lambda obj: (json.dumps(obj) + '\n').encode()
+    deltas = lambda seq: [encode({'seq': i, 'base': i - 1, 'delta': make_delta(quantize(a, 1), quantize(b, 1))})
+                          for i, (a, b) in enumerate(zip(seq, seq[1:]))]
+
+    # Train on the first half, measure on the second
+    half = len(states) // 2
+    trained = train_dictionary([encode(s) for s in states[:half]] + deltas(states[:half]), args.dict_size)
+    if args.train_dict:
+        with open(args.train_dict, 'wb') as f:
+            f.write(trained)
+        print(f"Wrote {len(trained)} byte dictionary to {args.train_dict}")
+
+    test = states[half:]
+    streams = {
+        'full': [encode(dict(s, seq=i)) for i, s in enumerate(test)],
+        'delta': deltas(test),
+    }
+    codecs = [('zlib-1', None, 1, False), ('zlib-6', None, 6, False), ('zlib-9', None, 9, False),
+              ('zdict-builtin', DEFAULT_DICTIONARY, 6, True), ('zdict-trained', trained, 6, True)]
+
+    print(f"{len(states)} snapshots ({half} train / {len(test)} test)\n")
+    print(f"{'stream':<6} {'codec':<14} {'bytes':>7} {'ratio':>6} {'compress':>10} {'decompress':>11}")
+    for stream, payloads in streams.items():
+        raw = sum(len(p) for p in payloads) / len(payloads)
+        print(f"{stream:<6} {'json':<14} {raw:>7.0f} {1:>6.2f} {'-':>10} {'-':>11}")
+        for name, dictionary, level, use_dict in codecs:
+            comp = Compressor(dictionary, level)
+            codec = comp.dict_codec if use_dict else 'zlib'
+            t0 = time.perf_counter()
+            packed = [comp.compress(p, codec) for p in payloads]
+            t1 = time.perf_counter()
+            for p in packed:
+                decompress(p, dictionary)
+            t2 = time.perf_counter()
+            size = sum(len(p) for p in packed) / len(packed)
+            print(f"{stream:<6} {name:<14} {size:>7.0f} {raw / size:>6.2f} "
+                  f"{(t1 - t0) / len(payloads) * 1e6:>8.1f}us {(t2 - t1) / len(payloads) * 1e6:>9.1f}us")
+
+
+def bench_checkpoint(args):
+    path = os.path.join(tempfile.mkdtemp(), 'world_checkpoint.json')
+    server = run_headless(GameServer(spectator_port=0, checkpoint_path=None))
+    writer = CheckpointWriter(server, path, compact_every=args.compact_every, fsync=not args.no_fsync)
+
+    wait_ms, lock_ms, write_ms, full_bytes, delta_bytes = [], [], [], [], []
+    for _ in range(args.writes):
+        time.sleep(args.interval)
+        writer.write()
+        wait_ms.append(writer.wait_ms)
+        lock_ms.append(writer.lock_ms)
+        write_ms.append(writer.write_ms)
+        (full_bytes if writer.last_full else delta_bytes).append(writer.last_bytes)
+
+    t0 = time.perf_counter()
+    checkpoint = load_checkpoint(path)
+    t1 = time.perf_counter()
+    resumed = GameServer(spectator_port=0, checkpoint_path=None)
+    with resumed.state_lock:
+        resumed.restore_checkpoint(checkpoint['sections'])
+    t2 = time.perf_counter()
+
+    mean = lambda v: sum(v) / len(v) if v else 0
+    print(f"{args.writes} checkpoints every {args.interval}s, base rewritten every {args.compact_every}, "
+          f"fsync {'off' if args.no_fsync else 'on'}")
+    print(f"state_lock held:   mean {mean(lock_ms):.3f} ms, p99 {percentile(lock_ms, 99):.3f} ms "
+          f"(waited mean {mean(wait_ms):.3f} ms)")
+    print(f"Encode + write:    mean {mean(write_ms):.3f} ms, p99 {percentile(write_ms, 99):.3f} ms (writer thread)")
+    print(f"Size:              base {mean(full_bytes):.0f} bytes, journal line {mean(delta_bytes):.0f} bytes")
+    print(f"Resume:            load {(t1 - t0) * 1000:.2f} ms + restore {(t2 - t1) * 1000:.2f} ms")
+
+
+def bench_telemetry(args):
+    directory = tempfile.mkdtemp()
+    server = GameServer(spectator_port=0, checkpoint_path=None, event_log_path=None, telemetry_dir=directory)
+    server.telemetry.start()
+    run_headless(server)
+
+    t0 = time.perf_counter()
+    time.sleep(args.seconds)
+    elapsed = time.perf_counter() - t0
+    with server.state_lock:
+        server.telemetry.flush(partial=True)
+        stats = server.telemetry.stats()
+
+    t1 = time.perf_counter()
+    session = load_session(server.telemetry.path)
+    load_ms = (time.perf_counter() - t1) * 1000
+
+    tick_us = elapsed / stats['ticks'] * 1e6
+    compress_us = stats['compress_ms'] * 1000 / stats['ticks']
+    print(f"{stats['ticks']} ticks in {elapsed:.0f}s (one every {tick_us / 1000:.1f} ms)")
+    print(f"record() under lock:  {stats['record_us']:.2f} us/tick = {stats['record_us'] / tick_us * 100:.3f}% of tick time")
+    print(f"Compress + write:     {compress_us:.2f} us/tick = {compress_us / tick_us * 100:.3f}% (writer thread)")
+    print(f"File:                 {stats['bytes']} bytes, {stats['bytes'] / stats['ticks']:.1f} bytes/tick, "
+          f"ratio {stats['ratio']}")
+    print(f"Load into numpy:      {load_ms:.1f} ms for {len(session['tick'])} rows x {len(session) - 1} columns")
+
+
+def start_sessions(count, game_over):
+    """Full sessions (input file, state file, replication) on their own temp paths."""
+    servers = []
+    for _ in range(count):
+        directory = tempfile.mkdtemp()
+        server = GameServer(spectator_port=0, checkpoint_path=None, event_log_path=None,
+                            state_path=os.path.join(directory, 'game_state.json'),
+                            input_path=os.path.join(directory, 'player_input.json'),
+                            metrics_path=os.path.join(directory, 'server_metrics.json'))
+        server.game_over = game_over
+        server.build_scheduler(server.read_input, server.replicate_step).start()
+        servers.append(server)
+    return servers
+
+
+def bench_idle(args):
+    print(f"{args.sessions} sessions in one process, {args.seconds:.0f}s each run")
+    for label, game_over in (("playing", False), ("game over", True)):
+        servers = start_sessions(args.sessions, game_over)
+        time.sleep(1.0)  # Let idle sessions send their last snapshot and slow down
+
+        wakeups = sum(s.scheduler.wakeups for s in servers)
+        cpu, t0 = time.process_time(), time.perf_counter()
+        time.sleep(args.seconds)
+        elapsed = time.perf_counter() - t0
+        cpu = time.process_time() - cpu
+        wakeups = sum(s.scheduler.wakeups for s in servers) - wakeups
+
+        for server in servers:
+            server.scheduler.stop()
+        print(f"{label:>10}: CPU {cpu / elapsed * 100:6.1f}% of a core "
+              f"({cpu / elapsed / args.sessions * 100:.3f}% per session), "
+              f"{wakeups / elapsed / args.sessions:6.1f} wakeups/s per session")
+        time.sleep(0.5)
+
+
+def bench_sessions(args):
+    """Raise the number of sessions on one core until too many ticks miss their deadline."""
+    bot_input = {'dx': 0, 'shoot': True, 'restart': True}  # Keeps every session playing
+    model = "one thread per session" if args.threads else "one SessionHost thread"
+    print(f"{model}, {args.seconds:.0f}s per step, limit {args.max_miss}% missed ticks\n")
+    print(f"{'sessions':>8} {'CPU %':>6} {'ticks/s':>8} {'missed %':>8} {'late p99':>9} {'worst':>8}")
+
+    best = None
+    count = args.start
+    while count <= args.max_sessions:
+        directory = tempfile.mkdtemp()
+        servers = [GameServer(spectator_port=0, checkpoint_path=None, **session_paths(directory, i))
+                   for i in range(count)]
+        host = None
+        if args.threads:
+            for server in servers:
+                server.events.echo = False
+                server.build_scheduler(lambda s=server: s.apply_input(bot_input), server.replicate_step).start()
+        else:
+            host = SessionHost()
+            for server in servers:
+                host.add(server, input_step=lambda s=server: s.apply_input(bot_input))
+            host.start()
+        time.sleep(1.0)  # Warm up
+
+        ticks = lambda: sum(s.scheduler.phases['sim'].runs for s in servers)
+        overruns = lambda: sum(s.tick_overruns for s in servers)
+        ticks0, overruns0 = ticks(), overruns()
+        cpu, t0 = time.process_time(), time.perf_counter()
+        time.sleep(args.seconds)
+        elapsed = time.perf_counter() - t0
+        cpu = time.process_time() - cpu
+        ticked, missed = ticks() - ticks0, overruns() - overruns0
+
+        if host:
+            stats = host.stats()
+            host.stop()
+            late = f"{stats['late_ms']['p99']:>6.2f} ms {stats['session_late_max_ms']['max']:>5.1f} ms"
+        else:
+            for server in servers:
+                server.scheduler.stop()
+            late = f"{'-':>9} {'-':>8}"
+        miss_pct = missed / ticked * 100 if ticked else 100
+        print(f"{count:>8} {cpu / elapsed * 100:>6.1f} {ticked / elapsed:>8.0f} {miss_pct:>8.2f} {late}")
+        time.sleep(0.5)
+
+        if miss_pct > args.max_miss:
+            break
+        best = count
+        count = int(count * args.step)
+    print(f"\n{best or 0} sessions per core with at most {args.max_miss}% of ticks missing their deadline")
+
+
+def time_per_call(fn, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat * 1e6
+
+
+def bench_players(args):
+    """Tick time as players are added to one world, and the collision pass on its own."""
+    print(f"{args.mode}, {args.seconds:.0f}s per step, every player moving at random and shooting\n")
+    print(f"{'players':>7} {'active':>6} {'ticks/s':>7} {'tick ms':>8} {'max ms':>7} "
+          f"{'batched us':>10} {'pairwise us':>11}")
+
+    for count in args.counts:
+        server = GameServer(spectator_port=0, checkpoint_path=None, event_log_path=None,
+                            players=count, mode=args.mode)
+        server.events.echo = False
+
+        def drive(s=server):
+            for i in range(count):
+                s.apply_input({'dx': random.choice([-3, 0, 3]), 'shoot': True, 'restart': True}, i)
+
+        server.build_scheduler(drive).start()
+        active = []
+        end = time.perf_counter() + args.seconds
+        while time.perf_counter() < end:
+            time.sleep(0.1)
+            active.append(len(server._ships()))
+        server.scheduler.stop()
+        sim = server.scheduler.stats()['phases']['sim']
+
+        # Collision pass alone, with every ship in the world and a bullet in flight for each
+        with server.state_lock:
+            targets = server.helicopters + server.tankers + server.jets + server.fuel_depots + server.bridges
+            ships = server._new_players(count)
+            bullets = [Bullet(x=s.x, y=random.uniform(0, 500), owner=s.player_id) for s in ships]
+
+        def batched():
+            ships_vs_world(ships, targets)
+            bullets_vs_targets(bullets, targets)
+
+        def pairwise():
+            [(s, t) for t in targets for s in ships if s.collides_with(t)]
+            [(b, t) for t in targets for b in bullets if b.collides_with(t)]
+
+        repeat = max(10, 20000 // count)
+        print(f"{count:>7} {sum(active) / len(active):>6.1f} {sim['runs'] / args.seconds:>7.0f} "
+              f"{sim['mean_ms']:>8.3f} {sim['max_ms']:>7.2f} "
+              f"{time_per_call(batched, repeat):>10.1f} {time_per_call(pairwise, repeat):>11.1f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='bench', required=True)
+
+    p = sub.add_parser('spectators', help="Snapshot fan-out to many local spectators")
+    p.add_argument('--clients', type=int, default=300, help="Spectators that keep up")
+    p.add_argument('--slow', type=int, default=30, help="Spectators that never read")
+    p.add_argument('--rate', type=float, default=30, help="Broadcast rate in Hz")
+    p.add_argument('--seconds', type=float, default=10)
+    p.set_defaults(func=bench_spectators)
+
+    p = sub.add_parser('compression', help="Snapshot compression ratio vs CPU per snapshot")
+    p.add_argument('--samples', help="JSON-lines file from game_server.py --record-snapshots")
+    p.add_argument('--seconds', type=float, default=20, help="Gameplay to record when no samples given")
+    p.add_argument('--dict-size', type=int, default=8192)
+    p.add_argument('--train-dict', metavar='PATH', help="Also write the trained dictionary here")
+    p.set_defaults(func=bench_compression)
+
+    p = sub.add_parser('checkpoint', help="Checkpoint cost per session and resume time")
+    p.add_argument('--writes', type=int, default=200)
+    p.add_argument('--interval', type=float, default=0.02, help="Seconds of gameplay between checkpoints")
+    p.add_argument('--compact-every', type=int, default=30)
+    p.add_argument('--no-fsync', action='store_true')
+    p.set_defaults(func=bench_checkpoint)
+
+    p = sub.add_parser('telemetry', help="Per-tick telemetry cost vs tick time")
+    p.add_argument('--seconds', type=float, default=30)
+    p.set_defaults(func=bench_telemetry)
+
+    p = sub.add_parser('idle', help="CPU cost of sessions sitting in game over vs playing")
+    p.add_argument('--sessions', type=int, default=200)
+    p.add_argument('--seconds', type=float, default=10)
+    p.set_defaults(func=bench_idle)
+
+    p = sub.add_parser('sessions', help="Sessions per core at a fixed tick deadline miss rate")
+    p.add_argument('--max-miss', type=float, default=1.0, help="Percent of ticks allowed to overrun")
+    p.add_argument('--start', type=int, default=25)
+    p.add_argument('--step', type=float, default=1.5, help="Session count multiplier per step")
+    p.add_argument('--max-sessions', type=int, default=5000)
+    p.add_argument('--seconds', type=float, default=5)
+    p.add_argument('--threads', action='store_true', help="Baseline: every session on its own scheduler thread")
+    p.set_defaults(func=bench_sessions)
+
+    p = sub.add_parser('players', help="Tick and collision cost as players share one world")
+    p.add_argument('--counts', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32, 64])
+    p.add_argument('--mode', choices=GAME_MODES, default='coop')
+    p.add_argument('--seconds', type=float, default=5)
+    p.set_defaults(func=bench_players)
+
+    args = parser.parse_args()
+    args.func(args)
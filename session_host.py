@@ -0,0 +1,250 @@
+"""Many game sessions on one thread.
+
+A GameServer started on its own runs a scheduler thread plus writer
+threads. A SessionHost instead takes over the schedulers of many servers and
+keeps one timer per session on a hierarchical timer wheel. When a session's
+timer fires, the host runs that session's due phases (input -> spawn -> sim
+-> replicate, exactly as its own loop would) and re-arms the timer for the
+session's next wakeup, so idle sessions cost nothing between their timers.
+Metrics files, event logs and telemetry are written from the same loop on a
+slower per-session timer, staggered across sessions. Checkpoints are fsynced,
+which can block for milliseconds, so that timer only queues them for one
+shared checkpoint thread.
+
+Sessions whose timers fire on the same wheel tick run earliest-deadline
+first, ties going to the one that waited longest. Each session's start is
+offset within one tick so they do not all fall due at once.
+
+One host uses one core; run one host process per core for more sessions.
+
+Usage:
+    python session_host.py --sessions 200 --dir /tmp/sessions
+
+Each session gets a directory (session-000, ...) holding its
+player_input.json, game_state.json, server_metrics.json and
+server_events.jsonl.
+"""
+import argparse
+import os
+import queue
+import threading
+import time
+from collections import deque
+from functools import partial
+
+from game_server import GameServer, percentile
+from profiler import SamplingProfiler
+from timer_wheel import TimerWheel
+
+
+class Session:
+    def __init__(self, server, index):
+        self.server = server
+        self.index = index
+        self.scheduler = server.scheduler
+        self.due = 0.0
+        self.last_run = 0.0
+        self.runs = 0
+        self.busy_s = 0.0
+        self.late_max_s = 0.0
+        self.checkpoint_queued = False
+
+
+class SessionHost:
+    def __init__(self, resolution=0.001, housekeeping_interval=2.0, name="SessionHost"):
+        self.timers = TimerWheel(resolution)
+        self.housekeeping_interval = housekeeping_interval
+        self.name = name
+        self.sessions: list[Session] = []
+        self.ready: list[Session] = []  # Sessions whose timer fired this cycle
+        self.wakeup = threading.Event()
+        self.running = False
+        self.checkpoint_queue = queue.Queue()  # Sessions due a checkpoint; None stops the writer
+        self.checkpoint_thread = None
+
+        # Stats
+        self.started = None
+        self.cycles = 0
+        self.busy_s = 0.0
+        self.late_ms = deque(maxlen=10000)  # Recent session start delays, all sessions
+
+    def add(self, server: GameServer, input_step=None) -> Session:
+        """Take over an unstarted server's periodic work. Call before start()."""
+        if server.checkpoint_path:
+            server._resume()
+        server.events.echo = False  # Thousands of sessions on one console is noise
+        server.build_scheduler(input_step or server.read_input, server.replicate_step)
+        session = Session(server, len(self.sessions))
+        self.sessions.append(session)
+        return session
+
+    def start(self):
+        if any(s.server.checkpoints for s in self.sessions):
+            self.checkpoint_thread = threading.Thread(target=self._write_checkpoints, daemon=True,
+                                                      name=f"{self.name}-Checkpoint")
+            self.checkpoint_thread.start()
+        thread = threading.Thread(target=self.run, daemon=True, name=self.name)
+        thread.start()
+        return thread
+
+    def run(self):
+        print(f"[{self.name}] {len(self.sessions)} sessions on one thread")
+        now = time.perf_counter()
+        self.started = now
+        for session in self.sessions:
+            offset = session.index / len(self.sessions)
+            session.scheduler.begin(now + offset / session.server.tick_rate)
+            self._arm(session)
+            self.timers.schedule(offset * self.housekeeping_interval, partial(self._housekeeping, session))
+        self.running = True
+
+        while self.running:
+            self.timers.advance(time.perf_counter())
+            if self.ready:
+                ready, self.ready = self.ready, []
+                ready.sort(key=lambda s: (s.due, s.last_run))
+                for session in ready:
+                    self._run_session(session)
+            self.cycles += 1
+
+            due = self.timers.next_deadline()
+            self.wakeup.wait(None if due is None else max(0, due - time.perf_counter()))
+            self.wakeup.clear()
+
+    def _arm(self, session):
+        due = session.scheduler.next_wakeup()
+        if due is None:
+            return  # Everything paused and no timers; nothing in the server does this
+        session.due = due
+        self.timers.schedule_at(due, partial(self._make_ready, session))
+
+    def _make_ready(self, session):
+        self.ready.append(session)
+
+    def _run_session(self, session):
+        t0 = time.perf_counter()
+        late = t0 - session.due
+        session.late_max_s = max(session.late_max_s, late)
+        self.late_ms.append(late * 1000)
+
+        session.scheduler.run_due(t0)
+
+        t1 = time.perf_counter()
+        session.runs += 1
+        session.busy_s += t1 - t0
+        session.last_run = t1
+        self.busy_s += t1 - t0
+        self._arm(session)
+
+    def _housekeeping(self, session):
+        """What a standalone server does on its status, event, checkpoint and telemetry threads."""
+        server = session.server
+        try:
+            server._write_metrics()
+            if server.events.ring and server.events.path:
+                with open(server.events.path, 'a') as f:
+                    server.events.drain(f)
+            elif server.events.ring:
+                server.events.drain()
+            if server.checkpoints and not session.checkpoint_queued:
+                session.checkpoint_queued = True  # Still queued if the disk is slow: don't pile up
+                self.checkpoint_queue.put(session)
+            if server.telemetry:
+                server.telemetry.flush()
+        except OSError as e:
+            print(f"[{self.name}] Session {session.index}: {e}")
+        self.timers.schedule(self.housekeeping_interval, partial(self._housekeeping, session))
+
+    def _write_checkpoints(self):
+        """Off the host thread, so an fsync never delays a tick"""
+        while True:
+            session = self.checkpoint_queue.get()
+            if session is None:
+                return
+            session.checkpoint_queued = False
+            try:
+                session.server.checkpoints.write()
+            except OSError as e:
+                print(f"[{self.name}] Session {session.index}: {e}")
+
+    def stop(self):
+        self.running = False
+        self.wakeup.set()
+
+    def close(self):
+        if self.checkpoint_thread:
+            self.checkpoint_queue.put(None)
+            self.checkpoint_thread.join()
+        for session in self.sessions:
+            server = session.server
+            server.replicator.close()
+            if server.checkpoints:
+                server.checkpoints.write()
+            if server.telemetry:
+                server.telemetry.close()
+
+    def stats(self) -> dict:
+        elapsed = time.perf_counter() - self.started if self.started else 0
+        ticks = sum(s.scheduler.phases['sim'].runs for s in self.sessions)
+        overruns = sum(s.server.tick_overruns for s in self.sessions)
+        worst = sorted(s.late_max_s * 1000 for s in self.sessions)
+        return {
+            'sessions': len(self.sessions),
+            'cycles': self.cycles,
+            'busy_pct': round(self.busy_s / elapsed * 100, 1) if elapsed else 0,
+            'ticks': ticks,
+            'overruns': overruns,
+            'miss_pct': round(overruns / ticks * 100, 3) if ticks else 0,
+            'late_ms': {
+                'p50': round(percentile(self.late_ms, 50), 3),
+                'p99': round(percentile(self.late_ms, 99), 3),
+            },
+            # Fairness: the worst start delay of the median and of the unluckiest session
+            'session_late_max_ms': {
+                'median': round(percentile(worst, 50), 2),
+                'max': round(worst[-1], 2) if worst else 0,
+            },
+        }
+
+
+def session_paths(directory, index):
+    session_dir = os.path.join(directory, f'session-{index:03d}')
+    os.makedirs(session_dir, exist_ok=True)
+    return {
+        'state_path': os.path.join(session_dir, 'game_state.json'),
+        'input_path': os.path.join(session_dir, 'player_input.json'),
+        'metrics_path': os.path.join(session_dir, 'server_metrics.json'),
+        'event_log_path': os.path.join(session_dir, 'server_events.jsonl'),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=100)
+    parser.add_argument('--dir', default='/tmp/sessions', help="One subdirectory per session is created here")
+    parser.add_argument('--input-rate', type=float, default=None, help="Default: the tick rate")
+    parser.add_argument('--replication-rate', type=float, default=None, help="Default: the tick rate")
+    parser.add_argument('--profile-dir', default='/tmp', help="Where SIGUSR1 profiles of the host thread go")
+    args = parser.parse_args()
+
+    rates = {k: v for k, v in (('input_rate', args.input_rate), ('replication_rate', args.replication_rate)) if v}
+    host = SessionHost()
+    for i in range(args.sessions):
+        host.add(GameServer(spectator_port=0, checkpoint_path=None, **session_paths(args.dir, i), **rates))
+
+    profiler = SamplingProfiler(args.profile_dir, threads=[host.name])
+    profiler.install_signal()
+    profiler.start()
+    host.start()
+    print(f"Hosting {args.sessions} sessions under {args.dir} (pid {os.getpid()})... Press Ctrl+C to stop\n")
+
+    try:
+        while True:
+            time.sleep(2)
+            s = host.stats()
+            print(f"[{host.name}] busy {s['busy_pct']}% | ticks {s['ticks']} | missed {s['miss_pct']}% | "
+                  f"late p99 {s['late_ms']['p99']} ms | worst session {s['session_late_max_ms']['max']} ms")
+    except KeyboardInterrupt:
+        print("\n\nHost shutting down...")
+        host.stop()
+        host.close()
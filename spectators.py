@@ -0,0 +1,186 @@
+import json
+import socket
+import threading
+
+# Spectator defaults (localhost only - remote viewers come in through an SSH tunnel)
+SPECTATOR_HOST = '127.0.0.1'
+SPECTATOR_PORT = 5557
+
+
+class Spectator:
+    def __init__(self, sock: socket.socket, addr):
+        self.sock = sock
+        self.addr = addr
+        self.pending: memoryview | None = None  # Unsent tail of the current frame
+        self.stride = 1                         # Send every Nth frame
+        self.lag_frames = 0                     # Consecutive frames we could not send
+        self.clean_frames = 0                   # Consecutive frames sent without backlog
+        self.frames_sent = 0
+        self.frames_skipped = 0
+        self.codec = None        # Negotiated from the spectator's hello line
+        self.hello = b''
+        self.negotiating = True
+        self.hello_polls = 30    # Frames to wait for a hello before settling on plain JSON
+
+    def flush(self) -> bool:
+        """Try to finish the current frame. Returns True when nothing is pending."""
+        if self.pending is None:
+            return True
+        try:
+            sent = self.sock.send(self.pending)
+        except BlockingIOError:
+            sent = 0
+        if sent < len(self.pending):
+            self.pending = self.pending[sent:]
+            return False
+        self.pending = None
+        self.frames_sent += 1
+        return True
+
+    def read_hello(self, compressor):
+        """Optional first line from the spectator, e.g. {"accept": ["zlib"]}."""
+        try:
+            data = self.sock.recv(1024)
+        except BlockingIOError:
+            self.hello_polls -= 1
+            self.negotiating = self.hello_polls > 0
+            return
+        self.hello += data
+        if b'\n' in self.hello or not data or len(self.hello) > 4096:
+            self.negotiating = False
+            try:
+                accept = json.loads(self.hello.split(b'\n')[0]).get('accept', [])
+            except (ValueError, AttributeError):
+                return
+            if compressor:
+                self.codec = compressor.choose(accept)
+
+
+class SpectatorHub:
+    """Fans one encoded snapshot out to many read-only spectator sockets.
+
+    broadcast() never blocks: sockets are non-blocking, and a spectator that
+    cannot keep up is first degraded to a lower frame rate, then dropped.
+    Each frame is compressed at most once per codec, however many
+    spectators asked for it.
+    """
+
+    def __init__(self, host=SPECTATOR_HOST, port=SPECTATOR_PORT, max_spectators=500,
+                 send_buffer=32768, max_stride=8, degrade_after=5, drop_after=90, recover_after=60,
+                 compressor=None):
+        self.host = host
+        self.compressor = compressor
+        self.port = port
+        self.max_spectators = max_spectators
+        self.send_buffer = send_buffer      # Kernel buffer per spectator, bounds memory for slow readers
+        self.max_stride = max_stride        # Lowest rate is 1/max_stride of the replication rate
+        self.degrade_after = degrade_after  # Frames behind before halving the rate
+        self.drop_after = drop_after        # Frames behind at lowest rate before disconnecting
+        self.recover_after = recover_after  # Clean frames before doubling the rate again
+
+        self.spectators: list[Spectator] = []
+        self.lock = threading.Lock()
+        self.frame_no = 0
+        self.dropped = 0
+        self.server_sock: socket.socket | None = None
+
+    def start(self):
+        self.server_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server_sock.bind((self.host, self.port))
+        self.server_sock.listen(128)
+        self.port = self.server_sock.getsockname()[1]
+
+        thread = threading.Thread(target=self._accept_loop, daemon=True, name="Spectators")
+        thread.start()
+        return thread
+
+    def _accept_loop(self):
+        print(f"[Spectators] Listening on {self.host}:{self.port}")
+        while True:
+            try:
+                sock, addr = self.server_sock.accept()
+            except OSError:
+                return  # Listening socket closed
+
+            with self.lock:
+                if len(self.spectators) >= self.max_spectators:
+                    sock.close()
+                    continue
+                sock.setblocking(False)
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.send_buffer)
+                self.spectators.append(Spectator(sock, addr))
+
+    def broadcast(self, payload: bytes):
+        """Send one already-encoded frame to every spectator."""
+        self.frame_no += 1
+        with self.lock:
+            spectators = list(self.spectators)
+
+        frames = {None: payload}
+        gone = []
+        for spec in spectators:
+            try:
+                if spec.negotiating:
+                    spec.read_hello(self.compressor)
+
+                if not spec.flush():
+                    # Still behind on the previous frame - skip this one
+                    spec.frames_skipped += 1
+                    spec.lag_frames += 1
+                    spec.clean_frames = 0
+                    if spec.stride < self.max_stride:
+                        if spec.lag_frames >= self.degrade_after:
+                            spec.stride *= 2
+                            spec.lag_frames = 0
+                    elif spec.lag_frames >= self.drop_after:
+                        gone.append(spec)
+                    continue
+
+                spec.lag_frames = 0
+                spec.clean_frames += 1
+                if spec.stride > 1 and spec.clean_frames >= self.recover_after:
+                    spec.stride //= 2
+                    spec.clean_frames = 0
+
+                if self.frame_no % spec.stride:
+                    spec.frames_skipped += 1
+                    continue
+
+                frame = frames.get(spec.codec)
+                if frame is None:
+                    frame = frames[spec.codec] = self.compressor.compress(payload, spec.codec)
+                spec.pending = memoryview(frame)
+                spec.flush()
+            except OSError:
+                gone.append(spec)
+
+        if gone:
+            self._remove(gone)
+
+    def _remove(self, gone):
+        with self.lock:
+            for spec in gone:
+                if spec in self.spectators:
+                    self.spectators.remove(spec)
+                    self.dropped += 1
+        for spec in gone:
+            spec.sock.close()
+
+    def stats(self) -> dict:
+        with self.lock:
+            spectators = list(self.spectators)
+        return {
+            'connected': len(spectators),
+            'degraded': sum(1 for s in spectators if s.stride > 1),
+            'dropped': self.dropped,
+        }
+
+    def close(self):
+        if self.server_sock:
+            self.server_sock.close()
+        with self.lock:
+            spectators, self.spectators = self.spectators, []
+        for spec in spectators:
+            spec.sock.close()
@@ -0,0 +1,219 @@
+"""Split-process server: simulation in one process, client I/O in another.
+
+The simulation process owns the GameServer world and its scheduler runs
+only the spawn and sim phases (plus checkpoints, which need the world).
+After every tick it marshals a snapshot into shared memory. The I/O process
+- the one you start - reads the input file, encodes and compresses
+snapshots per client, serves spectators and writes the state and metrics
+files, so none of that work competes with the tick for the simulation's GIL.
+
+Inputs travel back the same way: the I/O process parses the client's JSON
+and drops the latest input into a second shared-memory slot.
+"""
+import json
+import marshal
+import multiprocessing
+import os
+import struct
+import time
+from multiprocessing import shared_memory
+
+from game_server import GameServer, PROFILE_CONTROL_PATH, PROFILE_DIR, Replicator, TICK_RATE, write_metrics
+from profiler import SamplingProfiler
+from scheduler import MultiRateScheduler
+
+
+class SharedSlot:
+    """Single-writer, latest-value-wins buffer in shared memory.
+
+    Guarded by a sequence counter: the writer makes it odd while copying and
+    even when done, and a reader retries if it saw an odd or changed value.
+    """
+
+    HEADER = struct.Struct('<QI')  # seq, length
+
+    def __init__(self, shm: shared_memory.SharedMemory):
+        self.shm = shm
+        self.capacity = shm.size - self.HEADER.size
+        self.seq = 0
+        self.last_read = 0
+
+    @classmethod
+    def create(cls, capacity):
+        return cls(shared_memory.SharedMemory(create=True, size=capacity + cls.HEADER.size))
+
+    def write(self, data: bytes):
+        if len(data) > self.capacity:
+            raise ValueError(f"{len(data)} bytes does not fit in a {self.capacity} byte slot")
+        buf = self.shm.buf
+        self.seq += 1
+        struct.pack_into('<Q', buf, 0, self.seq)  # Odd: write in progress
+        buf[self.HEADER.size:self.HEADER.size + len(data)] = data
+        self.seq += 1
+        self.HEADER.pack_into(buf, 0, self.seq, len(data))
+
+    def read_new(self) -> bytes | None:
+        """Latest value if it changed since the last call, else None."""
+        buf = self.shm.buf
+        for _ in range(100):
+            seq, length = self.HEADER.unpack_from(buf)
+            if seq == self.last_read:
+                return None
+            if seq & 1:
+                continue
+            data = bytes(buf[self.HEADER.size:self.HEADER.size + length])
+            if struct.unpack_from('<Q', buf)[0] == seq:
+                self.last_read = seq
+                return data
+        return None
+
+    def close(self, unlink=False):
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+def simulation_main(snapshot_slot, input_slot, metrics_slot, simulation_args, input_rate):
+    """Entry point of the simulation process."""
+    server = GameServer(spectator_port=0, **simulation_args)
+    if server.checkpoint_path:
+        server._resume()
+
+    last_tick = None
+
+    def read_input():
+        data = input_slot.read_new()
+        if data is not None:
+            server.apply_input(marshal.loads(data))
+
+    def publish():
+        nonlocal last_tick
+        if server.tick != last_tick:
+            with server.state_lock:
+                state = server.build_snapshot()
+            last_tick = state['tick']
+            snapshot_slot.write(marshal.dumps(state))
+            server._after_replicate(True)
+
+    server.input_rate = input_rate
+    server.replication_rate = server.tick_rate  # Publish right after every tick
+    scheduler_thread = server.build_scheduler(read_input, publish).start()
+    server.events.start()
+    if server.telemetry:
+        server.telemetry.start()
+    server.profiler.start()
+    server.profiler.install_signal()
+    if server.checkpoints:
+        server.checkpoints.start()
+    print(f"[Simulation] Running in process {os.getpid()}")
+
+    try:
+        while True:
+            time.sleep(2)
+            metrics = dict(server.simulation_metrics(), simulation_pid=os.getpid())
+            metrics_slot.write(marshal.dumps(metrics))
+            server._emit_status()  # From here, not the I/O process: snapshots don't carry the bridge
+    except KeyboardInterrupt:
+        server.scheduler.stop()  # No tick may run while the final checkpoint and telemetry are written
+        scheduler_thread.join()
+        if server.checkpoints:
+            server.checkpoints.write()
+        if server.telemetry:
+            server.telemetry.close()
+        server.events.stop()
+
+
+class IOServer:
+    """The I/O half: input file -> shared memory -> snapshots to clients."""
+
+    def __init__(self, snapshot_slot, input_slot, metrics_slot, replication_args, input_path, metrics_path,
+                 profile_dir=PROFILE_DIR, profile_rate=100, input_rate=TICK_RATE, replication_rate=TICK_RATE):
+        self.input_path = input_path
+        self.metrics_path = metrics_path
+        self.profiler = SamplingProfiler(profile_dir, PROFILE_CONTROL_PATH, profile_rate)
+        self.scheduler = MultiRateScheduler("I/O")
+        self.scheduler.add('input', self.read_input, input_rate)
+        self.scheduler.add('replicate', self.replicate_step, replication_rate)
+        self.last_raw = None
+        self.snapshot_slot = snapshot_slot
+        self.input_slot = input_slot
+        self.metrics_slot = metrics_slot
+        self.replicator = Replicator(**replication_args)
+
+        self.state = None
+        self.pending_input = {}
+        self.sim_metrics = {}
+
+    def latest_state(self):
+        data = self.snapshot_slot.read_new()
+        if data is not None:
+            self.state = marshal.loads(data)
+        return self.state
+
+    def read_input(self):
+        try:
+            with open(self.input_path, 'rb') as f:
+                raw = f.read()
+            if raw != self.last_raw:
+                self.pending_input = json.loads(raw)
+                self.input_slot.write(marshal.dumps(self.pending_input))
+                self.replicator.note_input(self.pending_input.get('seq'))
+                self.last_raw = raw
+        except (FileNotFoundError, ValueError):
+            pass
+
+    def replicate_step(self):
+        state = self.state
+        self.replicator.idle = bool(state and (state['respawning'] or state['game_over']))
+        self.replicator.step(self.latest_state, lambda player: self.pending_input)
+
+    def metrics(self):
+        data = self.metrics_slot.read_new()
+        if data is not None:
+            self.sim_metrics = marshal.loads(data)
+        return {
+            'timestamp': time.time(),
+            **self.replicator.metrics(),
+            **self.sim_metrics,
+            'io_pid': os.getpid(),
+            'io_profiler': self.profiler.stats(),
+            'io_scheduler': self.scheduler.stats(),
+        }
+
+    def run(self):
+        self.scheduler.start()
+        self.replicator.start()
+        self.profiler.start()
+        self.profiler.install_signal()
+
+        while True:
+            time.sleep(2)
+            write_metrics(self.metrics(), self.metrics_path)
+
+
+def run_split(simulation_args, replication_args, io_args):
+    print("=== River Raid Server Starting (split process) ===")
+    snapshot_slot = SharedSlot.create(256 * 1024)
+    input_slot = SharedSlot.create(16 * 1024)
+    metrics_slot = SharedSlot.create(16 * 1024)
+    slots = (snapshot_slot, input_slot, metrics_slot)
+
+    simulation_args = dict(simulation_args, profile_dir=io_args['profile_dir'], profile_rate=io_args['profile_rate'])
+    sim = multiprocessing.Process(target=simulation_main, args=slots + (simulation_args, io_args['input_rate']),
+                                  name="Simulation", daemon=True)
+    sim.start()
+
+    io = IOServer(*slots, replication_args, **io_args)
+    print(f"[I/O] Running in process {os.getpid()}")
+    print("\nServer running... Press Ctrl+C to stop\n")
+    try:
+        io.run()
+    except KeyboardInterrupt:
+        print("\n\nServer shutting down...")
+        io.replicator.close()
+        sim.join(timeout=2)  # Simulation got the same Ctrl+C and writes a final checkpoint
+        if sim.is_alive():
+            sim.terminate()
+    finally:
+        for slot in slots:
+            slot.close(unlink=True)
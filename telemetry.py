@@ -0,0 +1,232 @@
+"""Per-tick gameplay telemetry in a compact columnar file.
+
+The game tick calls TelemetryRecorder.record() under state_lock; that only
+appends a handful of numbers to array.array columns. Every `chunk_ticks`
+ticks the full arrays are handed to a writer thread, which zlib-compresses
+each column and appends the block to the session file. close() stops the
+writer and writes the partial block; ticks must have stopped by then (or
+the caller holds state_lock), or it could catch a half-appended row.
+
+File layout (all integers little-endian):
+
+    b'RRTL' <u32 header length> <JSON header: columns, death causes, start time>
+    block*: <u32 rows> <u32 compressed length per column> <column data...>
+
+Column data is the raw array bytes (native byte order), so a reader can
+hand it straight to numpy.frombuffer. load_session() does that for a whole
+file through mmap.
+
+Usage:
+    python telemetry.py summary /tmp/telemetry/session-1700000000.rrt
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from array import array
+
+MAGIC = b'RRTL'
+
+DEATH_CAUSES = ['Out of fuel', 'Hit riverbank', 'Hit bridge', 'Hit Helicopter', 'Hit Tanker', 'Hit Jet', 'Other']
+DEATH_COLUMNS = ['death_' + cause.lower().replace(' ', '_') for cause in DEATH_CAUSES]
+
+# Name, array typecode
+COLUMNS = [
+    ('tick', 'I'),
+    ('game', 'H'),          # Incremented on every restart after game over
+    ('fuel', 'f'),          # Lowest of all players
+    ('scroll_speed', 'f'),
+    ('score', 'i'),         # Summed over players
+    ('lives', 'h'),         # Summed over players
+    ('helicopters', 'B'),
+    ('tankers', 'B'),
+    ('jets', 'B'),
+    ('fuel_depots', 'B'),
+    ('bridges', 'B'),
+] + [(name, 'B') for name in DEATH_COLUMNS]  # Deaths from each cause this tick (several ships can die at once)
+
+
+class TelemetryRecorder:
+    def __init__(self, path: str, chunk_ticks=1024, level=6, flush_interval=1.0):
+        self.path = path
+        self.chunk_ticks = chunk_ticks
+        self.level = level
+        self.flush_interval = flush_interval
+
+        self.columns = self._new_columns()
+        self.full: list[dict[str, array]] = []  # Chunks waiting for the writer (list ops are atomic)
+        self.game = 0
+        self.deaths = [0] * len(DEATH_CAUSES)
+
+        # Stats
+        self.record_s = 0.0
+        self.ticks = 0
+        self.compress_ms = 0.0
+        self.bytes_written = 0
+        self.raw_bytes = 0
+        self.write_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+
+        header = json.dumps({
+            'columns': COLUMNS,
+            'death_causes': DEATH_CAUSES,
+            'start_time': time.time(),
+        }).encode()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.file = open(path, 'wb')
+        self.file.write(MAGIC + struct.pack('<I', len(header)) + header)
+        self.file.flush()
+
+    @staticmethod
+    def _new_columns():
+        return {name: array(typecode) for name, typecode in COLUMNS}
+
+    def note_death(self, reason: str):
+        self.deaths[DEATH_CAUSES.index(reason) if reason in DEATH_CAUSES else -1] += 1
+
+    def note_restart(self):
+        self.game += 1
+
+    def record(self, server):
+        """Sample one tick. Caller holds state_lock."""
+        if self.file.closed:
+            return  # A tick that raced shutdown: nothing would write its row
+        t0 = time.perf_counter()
+        c = self.columns
+        c['tick'].append(server.tick)
+        c['game'].append(self.game)
+        c['fuel'].append(min(p.fuel for p in server.players))
+        c['scroll_speed'].append(server.river_scroll_speed)
+        c['score'].append(sum(p.score for p in server.players))
+        c['lives'].append(sum(p.lives for p in server.players))
+        c['helicopters'].append(len(server.helicopters))
+        c['tankers'].append(len(server.tankers))
+        c['jets'].append(len(server.jets))
+        c['fuel_depots'].append(len(server.fuel_depots))
+        c['bridges'].append(len(server.bridges))
+        for name, count in zip(DEATH_COLUMNS, self.deaths):
+            c[name].append(count)
+        if any(self.deaths):
+            self.deaths = [0] * len(DEATH_CAUSES)
+
+        if len(c['tick']) >= self.chunk_ticks:
+            self.full.append(c)
+            self.columns = self._new_columns()
+        self.ticks += 1
+        self.record_s += time.perf_counter() - t0
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, daemon=True, name="Telemetry")
+        self._thread.start()
+        return self._thread
+
+    def run(self):
+        print(f"[Telemetry] Recording to {self.path}")
+        while not self._stopping.wait(self.flush_interval):
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"[Telemetry] Write failed: {e}")
+
+    def flush(self, partial=False):
+        """Write every full chunk, and with partial=True the one being filled too."""
+        with self.write_lock:
+            if partial and len(self.columns['tick']):
+                self.full.append(self.columns)
+                self.columns = self._new_columns()
+            while self.full:
+                self._write_block(self.full.pop(0))
+
+    def _write_block(self, columns):
+        t0 = time.perf_counter()
+        rows = len(columns['tick'])
+        raw = [columns[name].tobytes() for name, _ in COLUMNS]
+        packed = [zlib.compress(data, self.level) for data in raw]
+        self.compress_ms += (time.perf_counter() - t0) * 1000
+
+        self.file.write(struct.pack(f'<{len(packed) + 1}I', rows, *map(len, packed)) + b''.join(packed))
+        self.file.flush()
+        self.bytes_written += 4 * (len(packed) + 1) + sum(map(len, packed))
+        self.raw_bytes += sum(map(len, raw))
+
+    def close(self):
+        """Stop the writer thread, then write everything recorded. Call it once the
+        ticks have stopped, or with state_lock held"""
+        self._stopping.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self.flush(partial=True)
+        self.file.close()
+
+    def stats(self) -> dict:
+        return {
+            'path': self.path,
+            'ticks': self.ticks,
+            'record_us': round(self.record_s / self.ticks * 1e6, 2) if self.ticks else 0,
+            'compress_ms': round(self.compress_ms, 1),
+            'bytes': self.bytes_written,
+            'ratio': round(self.raw_bytes / self.bytes_written, 2) if self.bytes_written else 0,
+        }
+
+
+def load_session(path: str) -> dict:
+    """Every column of a session file as a numpy array, plus the header under 'header'."""
+    import numpy as np
+
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if mm[:4] != MAGIC:
+            raise ValueError(f"{path} is not a telemetry file")
+        (header_len,) = struct.unpack_from('<I', mm, 4)
+        header = json.loads(mm[8:8 + header_len])
+        columns = header['columns']
+        block_header = struct.Struct(f'<{len(columns) + 1}I')
+
+        chunks = {name: [] for name, _ in columns}
+        pos = 8 + header_len
+        while pos + block_header.size <= len(mm):
+            rows, *lengths = block_header.unpack_from(mm, pos)
+            pos += block_header.size
+            if pos + sum(lengths) > len(mm):
+                break  # Block cut short by a crash
+            for (name, typecode), length in zip(columns, lengths):
+                data = zlib.decompress(mm[pos:pos + length])
+                chunks[name].append(np.frombuffer(data, dtype=np.dtype(typecode)))
+                pos += length
+
+    session = {name: np.concatenate(parts) if parts else np.array([], dtype=np.dtype(typecode))
+               for (name, typecode), parts in zip(columns, chunks.values())}
+    session['header'] = header
+    return session
+
+
+def summary(args):
+    import numpy as np
+
+    t0 = time.perf_counter()
+    s = load_session(args.path)
+    load_ms = (time.perf_counter() - t0) * 1000
+    causes = s['header']['death_causes']
+    print(f"{len(s['tick'])} ticks loaded in {load_ms:.1f} ms\n")
+    print(f"{'game':>4} {'ticks':>7} {'score':>7} {'deaths':>6} {'min fuel':>8} {'mean speed':>10}  causes")
+    for game in np.unique(s['game']):
+        rows = s['game'] == game
+        counts = [int(s['death_' + cause.lower().replace(' ', '_')][rows].sum()) for cause in causes]
+        cause_text = ', '.join(f"{cause} x{n}" for cause, n in zip(causes, counts) if n)
+        print(f"{game:>4} {rows.sum():>7} {s['score'][rows].max():>7} {sum(counts):>6} "
+              f"{s['fuel'][rows].min():>8.1f} {s['scroll_speed'][rows].mean():>10.2f}  {cause_text}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('summary', help="Per-game score, deaths, fuel and speed")
+    p.add_argument('path')
+    p.set_defaults(func=summary)
+    args = parser.parse_args()
+    args.func(args)
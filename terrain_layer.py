@@ -0,0 +1,63 @@
+import pygame
+
+WATER = (20, 120, 200)
+LAND = (34, 139, 34)
+
+
+class TerrainLayer:
+    """River and banks pre-rendered into a ring surface and scrolled with blits.
+
+    Row r of the ring holds world row y where y % height == r, with world
+    rows counted so that screen y = world y + river_offset. Each frame only
+    the rows that scrolled in at the top are drawn, each with the banks the
+    snapshot gives for its own world row; the rest of the screen is two
+    blits, whatever the terrain looks like.
+    """
+
+    def __init__(self, width=800, height=600):
+        self.width = width
+        self.height = height
+        self.surface = pygame.Surface((width, height))
+        self.top = None          # World row at the top of the screen last frame
+        self.rows_drawn = 0      # Last frame, for profiling
+
+    def draw(self, screen, river_offset, spans):
+        """spans: the snapshot's river_spans, [{'y': first world row, 'left', 'right'}, ...]
+        top down, each running to the next one's first row."""
+        top = -int(river_offset)
+        if self.top is None or abs(top - self.top) >= self.height:
+            self._draw_rows(top, top + self.height, spans)  # First frame, or the game restarted
+        elif top < self.top:
+            self._draw_rows(top, self.top, spans)
+        elif top > self.top:
+            self._draw_rows(self.top + self.height, top + self.height, spans)
+        else:
+            self.rows_drawn = 0
+        self.top = top
+
+        split = top % self.height
+        screen.blit(self.surface, (0, 0), (0, split, self.width, self.height - split))
+        if split:
+            screen.blit(self.surface, (0, self.height - split), (0, 0, self.width, split))
+
+    def _draw_rows(self, start, end, spans):
+        """Render world rows [start, end) into the ring, span by span. Rows above
+        the first span or below the last take that span's banks."""
+        self.rows_drawn = end - start
+        if not spans:
+            self._fill(start, end, 0, self.width)  # No banks known: all water
+        for i, span in enumerate(spans):
+            lo = start if i == 0 else max(start, span['y'])
+            hi = end if i == len(spans) - 1 else min(end, spans[i + 1]['y'])
+            if lo < hi:
+                self._fill(lo, hi, int(span['left']), int(span['right']))
+
+    def _fill(self, start, end, left, right):
+        """Rows [start, end) with banks at left/right, split where the ring wraps."""
+        while start < end:
+            ring_row = start % self.height
+            rows = min(end - start, self.height - ring_row)
+            self.surface.fill(WATER, (0, ring_row, self.width, rows))
+            self.surface.fill(LAND, (0, ring_row, left, rows))
+            self.surface.fill(LAND, (right, ring_row, self.width - right, rows))
+            start += rows
@@ -0,0 +1,46 @@
+import json
+import os
+
+import game_server
+from checkpoints import CheckpointWriter, load_checkpoint
+from game_server import Bullet, GameServer
+
+
+def make_server(tmp_path, **kwargs):
+    return GameServer(spectator_port=0, checkpoint_path=str(tmp_path / 'world.json'),
+                      state_path=str(tmp_path / 'state.json'), input_path=str(tmp_path / 'input.json'),
+                      metrics_path=str(tmp_path / 'metrics.json'), event_log_path=None,
+                      profile_dir=str(tmp_path / 'profiles'), **kwargs)
+
+
+def test_journal_replays_to_the_latest_capture(tmp_path):
+    server = make_server(tmp_path, players=2)
+    writer = CheckpointWriter(server, server.checkpoint_path, compact_every=1000, fsync=False)
+    for tick in range(120):
+        server.pending_inputs = [{'dx': 1 if tick % 40 < 20 else -1, 'shoot': tick % 7 == 0}] * 2
+        with server.state_lock:
+            server.tick_step()
+        writer.write()
+    writer.journal.close()
+
+    checkpoint = load_checkpoint(server.checkpoint_path)
+    assert checkpoint['seq'] == writer.seq
+    assert checkpoint['sections'] == json.loads(json.dumps(server.capture_checkpoint()))
+
+    # Entity sections are journaled as per-entity changes, not full dumps
+    with open(server.checkpoint_path + '.journal') as f:
+        entries = [json.loads(line) for line in f]
+    assert all(entry['sections'].keys() <= {'world', 'river'} for entry in entries)
+    moved = [fields for entry in entries for fields in entry['entities'].get('fuel_depots', {}).get('changed', [])]
+    assert moved and all('width' not in fields for fields in moved)
+    assert os.path.getsize(server.checkpoint_path + '.journal') < 120 * os.path.getsize(server.checkpoint_path) / 2
+
+
+def test_restore_keeps_new_entity_ids_above_restored_bullets(tmp_path):
+    server = make_server(tmp_path)
+    bullet = Bullet(x=400, y=300, entity_id=10_000)
+    server.bullets = [bullet]
+    sections = json.loads(json.dumps(server.capture_checkpoint()))
+
+    server.restore_checkpoint(sections)
+    assert next(game_server._entity_ids) > bullet.entity_id
@@ -0,0 +1,16 @@
+import json
+
+from event_log import Death, EventLog, GameOver
+
+
+def test_stop_writes_the_last_event(tmp_path):
+    path = tmp_path / 'events.jsonl'
+    log = EventLog(str(path), flush_interval=60, echo=False)
+    log.start()
+    log.emit(Death(10, "Out of fuel", 0))
+    log.emit(GameOver(11, 250))
+    log.stop()
+
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [r['kind'] for r in records] == ['death', 'game_over']
+    assert records[-1]['score'] == 250
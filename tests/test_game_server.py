@@ -0,0 +1,92 @@
+import time
+
+from game_server import Bullet, GameServer, RiverSegment, RESPAWN_SECONDS, VIEW_HEIGHT
+
+
+def make_server(tmp_path, **kwargs):
+    return GameServer(spectator_port=0, checkpoint_path=None,
+                      state_path=str(tmp_path / 'state.json'), input_path=str(tmp_path / 'input.json'),
+                      metrics_path=str(tmp_path / 'metrics.json'), event_log_path=str(tmp_path / 'events.jsonl'),
+                      profile_dir=str(tmp_path / 'profiles'), **kwargs)
+
+
+def test_versus_game_over_during_respawn_stays_over(tmp_path):
+    server = make_server(tmp_path, players=2, mode='versus')
+    scheduler = server.build_scheduler()
+    first, second = server.players
+    first.lives, second.lives = 2, 1
+
+    # Both ships go down in one tick: a shared respawn starts, then versus is over
+    with server.state_lock:
+        server._handle_death(second, "Hit Helicopter")
+        server._handle_death(first, "Hit Helicopter")
+        assert server.respawning
+        assert server._out_of_players()
+        server.game_over = True
+        server._go_idle()
+
+    scheduler.timers.advance(time.perf_counter() + RESPAWN_SECONDS + 1)
+
+    assert server.game_over
+    assert not server.respawning
+    assert not any(p.active for p in server.players)
+    assert server.idle
+    assert scheduler.phases['sim'].paused
+
+
+def test_river_spans_give_each_screen_row_its_own_banks(tmp_path):
+    server = make_server(tmp_path)
+    server.river_segments = [RiverSegment(i * 100, 200 + 10 * i, 400) for i in range(20)]
+    server.river_y_offset = 1234
+    spans = server.build_snapshot()['river_spans']
+
+    assert spans[0]['y'] == -1234
+    for y in range(VIEW_HEIGHT):
+        row = y - 1234
+        span = [s for s in spans if s['y'] <= row][-1]
+        assert (span['left'], span['right']) == server._walls_at(y)
+
+
+def test_rewound_bullet_cannot_hit_a_recycled_depot_where_it_was(tmp_path):
+    server = make_server(tmp_path)
+    server.helicopters, server.tankers, server.jets, server.bridges = [], [], [], []
+    for player in server.players:
+        player.active = False
+    depot = server.fuel_depots[0]
+    server.fuel_depots = [depot]
+    depot.x, depot.y = 400, 200
+    for _ in range(3):
+        server.tick_step()
+    x, y = server.position_history[server.tick - 1][depot.entity_id]
+
+    # Two shooters who saw the depot at the same past tick, one tick apart
+    server.bullets = [Bullet(x=x, y=y, rewind_ticks=2)]
+    server.tick_step()
+    assert server.players[0].score == depot.points_if_destroyed
+    assert depot.y < 0
+
+    server.bullets = [Bullet(x=x, y=y, rewind_ticks=3)]
+    server.tick_step()
+    assert server.players[0].score == depot.points_if_destroyed
+    assert server.bullets
+
+
+def test_tick_step_alone_brings_dead_ships_back(tmp_path):
+    server = make_server(tmp_path, players=2, mode='versus')
+    server.helicopters, server.tankers, server.jets = [], [], []
+    first, second = server.players
+    respawn_ticks = round(RESPAWN_SECONDS * server.tick_rate) + 1
+
+    # No scheduler: tick_step calls count down the respawn
+    server._handle_death(first, "Hit Helicopter")
+    for _ in range(respawn_ticks):
+        server.tick_step()
+    assert first.active
+
+    server._handle_death(first, "Hit Helicopter")
+    server._handle_death(second, "Hit Helicopter")
+    assert server.respawning
+    for _ in range(respawn_ticks):
+        server.tick_step()
+    assert not server.respawning
+    assert first.active and second.active
@@ -0,0 +1,36 @@
+from types import SimpleNamespace
+
+from telemetry import COLUMNS, TelemetryRecorder, load_session
+
+
+def fake_server(tick):
+    player = SimpleNamespace(fuel=80.0, score=120, lives=2)
+    return SimpleNamespace(tick=tick, players=[player, player], river_scroll_speed=2.0, helicopters=[1],
+                           tankers=[], jets=[], fuel_depots=[1, 2], bridges=[1])
+
+
+def test_close_writes_every_recorded_tick(tmp_path):
+    recorder = TelemetryRecorder(str(tmp_path / 'session.rrt'), chunk_ticks=64, flush_interval=0.001)
+    recorder.start()
+    for tick in range(1000):
+        recorder.record(fake_server(tick))
+    recorder.close()
+    recorder.record(fake_server(1000))  # After close: dropped, not left in unwritten columns
+
+    session = load_session(recorder.path)
+    assert all(len(session[name]) == 1000 for name, _ in COLUMNS)
+    assert list(session['tick'][-3:]) == [997, 998, 999]
+
+
+def test_every_death_in_a_tick_is_counted(tmp_path):
+    recorder = TelemetryRecorder(str(tmp_path / 'session.rrt'))
+    recorder.note_death("Hit Jet")
+    recorder.note_death("Hit Jet")
+    recorder.note_death("Out of fuel")
+    recorder.record(fake_server(1))
+    recorder.record(fake_server(2))
+    recorder.close()
+
+    session = load_session(recorder.path)
+    assert list(session['death_hit_jet']) == [2, 0]
+    assert list(session['death_out_of_fuel']) == [1, 0]
@@ -0,0 +1,107 @@
+"""Hierarchical timing wheel for one-shot timers (respawn countdowns, session
+wakeups and the like).
+
+Level 0 has one slot per `resolution`; each level above has slots as wide as
+a whole lap of the level below (64 x 16 ms = 1 s, 64 s, ~68 min with the
+defaults). A timer goes into the lowest level whose lap still contains its
+deadline, and is moved down a level (cascaded) when the hand reaches its
+slot, so scheduling and cancelling are O(1) whatever the delay. Nothing wakes
+up just to count down - the owner sleeps until next_deadline() and then
+calls advance().
+"""
+import math
+import time
+
+
+class Timer:
+    __slots__ = ('deadline', 'callback', 'cancelled')
+
+    def __init__(self, deadline, callback):
+        self.deadline = deadline  # In wheel ticks
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TimerWheel:
+    def __init__(self, resolution=0.016, slots=64, levels=4, clock=time.perf_counter):
+        if slots & (slots - 1):
+            raise ValueError("slots must be a power of two")
+        self.resolution = resolution
+        self.bits = slots.bit_length() - 1
+        self.mask = slots - 1
+        self.wheels = [[[] for _ in range(slots)] for _ in range(levels)]
+        self.clock = clock
+        self.start = clock()
+        self.current = 0   # Wheel ticks since start that have been processed
+        self.pending = 0
+        self.fired = 0
+
+    def schedule(self, delay: float, callback) -> Timer:
+        return self.schedule_at(self.clock() + delay, callback)
+
+    def schedule_at(self, when: float, callback) -> Timer:
+        """Fire at clock time `when` (rounded up to the resolution), or on the next tick if that has passed."""
+        deadline = max(self.current + 1, math.ceil((when - self.start) / self.resolution))
+        timer = Timer(deadline, callback)
+        self._insert(timer)
+        self.pending += 1
+        return timer
+
+    def _insert(self, timer):
+        # Lowest level where the deadline and the hand only differ in that level's digit
+        for level in range(len(self.wheels)):
+            shift = self.bits * (level + 1)
+            if timer.deadline >> shift == self.current >> shift:
+                break
+        self.wheels[level][(timer.deadline >> (self.bits * level)) & self.mask].append(timer)
+
+    def remaining(self, timer: Timer) -> float:
+        return max(0.0, self.start + timer.deadline * self.resolution - self.clock())
+
+    def next_deadline(self) -> float | None:
+        """Clock time of the earliest pending timer, None if there are none."""
+        if not self.pending:
+            return None
+        # Level 0 only holds the current lap, so its first live slot after the hand is the earliest
+        wheel = self.wheels[0]
+        for i in range(1, len(wheel)):
+            slot = wheel[(self.current + i) & self.mask]
+            if any(not t.cancelled for t in slot):
+                return self.start + min(t.deadline for t in slot if not t.cancelled) * self.resolution
+        earliest = min((t.deadline for level in self.wheels[1:] for slot in level for t in slot
+                        if not t.cancelled), default=None)
+        return None if earliest is None else self.start + earliest * self.resolution
+
+    def advance(self, now: float | None = None):
+        """Fire every timer that is due by now. Callbacks run on the caller's thread."""
+        target = math.floor(((self.clock() if now is None else now) - self.start) / self.resolution)
+        while self.current < target:
+            if not self.pending:
+                self.current = target  # Nothing to fire - skip the empty laps
+                break
+            self.current += 1
+
+            for level in range(1, len(self.wheels)):
+                shift = self.bits * level
+                if self.current & ((1 << shift) - 1):
+                    break  # The hand is not at the start of a slot on this level
+                slot = self.wheels[level][(self.current >> shift) & self.mask]
+                cascading, slot[:] = slot[:], []
+                for timer in cascading:
+                    if timer.cancelled:
+                        self.pending -= 1
+                    else:
+                        self._insert(timer)
+
+            slot = self.wheels[0][self.current & self.mask]
+            if not slot:
+                continue
+            due, slot[:] = slot[:], []
+            for timer in due:
+                self.pending -= 1
+                if not timer.cancelled:
+                    self.fired += 1
+                    timer.callback()